@@ -2,357 +2,723 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import json
-import sys
-
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask_migrate import Migrate
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from models import *
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
 
-# ----------------------------------------------------------------------------#
-# App Config.
-# ----------------------------------------------------------------------------#
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, \
+    stream_with_context
+from flask.cli import AppGroup
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Importing this module has no side effects and stays cheap: the app,
+# database and extensions only exist once create_app() runs, and babel and
+# dateutil are imported on first use. A pre-fork server can preload the
+# app ("gunicorn --preload 'app:create_app()'") and share it with workers.
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+    import babel.dates
+
+    # parsing the CLDR pattern and the locale is the expensive part, do it once per pair
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    return pattern, babel.Locale.parse(locale)
+
+
+def apply_datetime_pattern(value, format, locale):
+    pattern, babel_locale = datetime_pattern(format, locale)
+    return pattern.apply(value, babel_locale)
+
+
+def datetime_filter(cache_size):
+    """The `datetime` filter, memoizing up to `cache_size` formatted values."""
+    format_cached = lru_cache(maxsize=cache_size)(apply_datetime_pattern)
 
+    def format_datetime(value, format='medium', locale='en'):
+        if not isinstance(value, datetime):
+            value = parse_date_arg(value)
+        return format_cached(value, format, locale)
 
-app.jinja_env.filters['datetime'] = format_datetime
+    format_datetime.cache_info = format_cached.cache_info
+    format_datetime.cache_clear = format_cached.cache_clear
+    return format_datetime
 
 
 # ----------------------------------------------------------------------------#
-# Controllers.
+# Helpers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-    venues = Venue.query.all()
-
-    state_city = set()
-    for venue in venues:
-        x = (venue.city, venue.state)
-        state_city.add(x)
-
-    venues = []
-    for sc in state_city:
-        venues.append(
-            {
-                'city': sc[0],
-                'state': sc[1],
-                'venues': Venue.query.filter_by(city=sc[0], state=sc[1]).all()
-            }
-        )
-
-    return render_template('pages/venues.html', areas=venues)
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    search = request.form.get('search_term', '')
-    result = Venue.query.filter(Venue.name.ilike('%{}%'.format(search))).all()
-    response = {
-        "count": len(result),
-        "data": result
-    }
-    return render_template('pages/search_venues.html', results=response,
-                           search_term=request.form.get('search_term', ''))
-
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    venue = Venue.query.filter_by(id=venue_id).first()
-    venue.past_shows = db.session.query(Show).join(Venue).filter(Show.venue_id == venue_id).filter(Show.start_time < datetime.now()).all()
-    venue.upcoming_shows = db.session.query(Show).join(Venue).filter(Show.venue_id == venue_id).filter(Show.start_time > datetime.now()).all()
-    venue.upcoming_shows_count = len(venue.upcoming_shows)
-    venue.past_shows_count = len(venue.past_shows)
-    return render_template('pages/show_venue.html', venue=venue)
-
-
-#  Create Venue
-#  ----------------------------------------------------------------
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    error = False
-    form = VenueForm(request.form)
-    validation = form.validate()
-    if not validation:
-        errors = form.errors
-        msg = list(errors.keys())
-        message = ','.join(msg)
-        flash('Improper values for ' + message + ' fields')
-        return redirect(url_for('create_venue_form'))
+def parse_date_arg(value):
+    import dateutil.parser
 
+    # request.args.get(type=...) only treats ValueError as "missing"
     try:
-        venue = Venue(name=form.data['name'],
-                      city=form.data['city'],
-                      state=form.data['state'],
-                      address=form.data['address'],
-                      phone=form.data['phone'],
-                      facebook_link=form.data['facebook_link'],
-                      genres=form.data['genres'],
-                      image_link = form.data['image_link'])
-        db.session.add(venue)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-
-    if error:
-        flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
-    else:
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-
-    return redirect(url_for('index'))
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-
-    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-    # clicking that button delete it from the db then redirect the user to the homepage
-    return None
-
-
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-    artists = Artist.query.all()
-    return render_template('pages/artists.html', artists=artists)
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    search = request.form.get('search_term', '')
-    result = Artist.query.filter(Artist.name.ilike('%{}%'.format(search))).all()
-    response = {
-        "count": len(result),
-        "data": result
-    }
-    return render_template('pages/search_artists.html', results=response,
-                           search_term=request.form.get('search_term', ''))
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    artist = Artist.query.get(artist_id)
-    artist.past_shows = db.session.query(Show).join(Artist).filter(Show.artist_id == artist_id).filter(
-        Show.start_time < datetime.now()).all()
-    artist.upcoming_shows = db.session.query(Show).join(Artist).filter(Show.artist_id == artist_id).filter(
-        Show.start_time > datetime.now()).all()
-    artist.upcoming_shows_count = len(artist.upcoming_shows)
-    artist.past_shows_count = len(artist.past_shows)
-    return render_template('pages/show_artist.html', artist=artist)
-
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    form = ArtistForm()
-    artist = {
-        "id": 4,
-        "name": "Guns N Petals",
-        "genres": ["Rock n Roll"],
-        "city": "San Francisco",
-        "state": "CA",
-        "phone": "326-123-5000",
-        "website": "https://www.gunsnpetalsband.com",
-        "facebook_link": "https://www.facebook.com/GunsNPetals",
-        "seeking_venue": True,
-        "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-        "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
-    }
-    # TODO: populate form with fields from artist with ID <artist_id>
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    # TODO: take values from the form submitted, and update existing
-    # artist record with ID <artist_id> using the new attributes
-
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    form = VenueForm()
-    venue = {
-        "id": 1,
-        "name": "The Musical Hop",
-        "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-        "address": "1015 Folsom Street",
-        "city": "San Francisco",
-        "state": "CA",
-        "phone": "123-123-1234",
-        "website": "https://www.themusicalhop.com",
-        "facebook_link": "https://www.facebook.com/TheMusicalHop",
-        "seeking_talent": True,
-        "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-        "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
-    }
-    # TODO: populate form with values from venue with ID <venue_id>
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    # TODO: take values from the form submitted, and update existing
-    # venue record with ID <venue_id> using the new attributes
-    return redirect(url_for('show_venue', venue_id=venue_id))
-
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    form = ArtistForm(request.form)
-    validation = form.validate()
-    if not validation:
-        errors = form.errors
-        msg = list(errors.keys())
-        message = ','.join(msg)
-        flash('Improper values for ' + message + ' fields')
-        return redirect(url_for('create_venue_form'))
-    error = False
-    try:
-        artist = Artist(name=form.data['name'],
-                        city=form.data['city'],
-                        state=form.data['state'],
-                        phone=form.data['phone'],
-                        facebook_link=form.data['facebook_link'],
-                        genres=form.data['genres'],
-                        image_link=form.data['image_link'],)
-
-        db.session.add(artist)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-
-    if error:
-        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
-    else:
-        flash('Artist ' + request.form['name'] + ' was successfully listed!')
-
-    return redirect(url_for('index'))
-
-
-#  ----------------------------------------------------------------
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-    shows = Show.query.all()
-    return render_template('pages/shows.html', shows=shows)
-
-
-@app.route('/shows/create', methods=['GET'])
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    error = False
-    try:
-        show = Show(artist_id=request.form['artist_id'],
-                    venue_id=request.form['venue_id'],
-                    start_time=request.form['start_time'])
-        db.session.add(show)
-        db.session.commit()
-    except:
-        error = True
-        db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-
-    if error:
-        flash('An error occurred. Show could not be listed.')
-    else:
-        flash('Show was successfully listed!')
-
-    return redirect(url_for('index'))
-
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+        parsed = dateutil.parser.parse(value)
+    except OverflowError as e:
+        raise ValueError(value) from e
+    # start times are stored naive in server local time, compare like with like
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def group_venues_by_area(venues):
+    # venues must already be ordered by (state, city) so that each area is a single run
+    areas = []
+    for (state, city), area_venues in groupby(venues, key=lambda venue: (venue.state, venue.city)):
+        areas.append({
+            'city': city,
+            'state': state,
+            'venues': list(area_venues)
+        })
+    return areas
+
+
+def split_shows(shows, now):
+    # one timestamp per request so a show can't land in both lists (or neither)
+    past_shows = []
+    upcoming_shows = []
+    scheduled = [show for show in shows if show.start_time is not None]
+    for show in sorted(scheduled, key=lambda show: show.start_time):
+        if show.start_time < now:
+            past_shows.append(show)
+        else:
+            upcoming_shows.append(show)
+    return past_shows, upcoming_shows
+
+
+def listing_filters():
+    genres = request.args.getlist('genre')
+    if not genres:
+        return {}
+    return {'genre': genres, 'match': 'all' if request.args.get('match') == 'all' else 'any'}
+
+
+def day_key(day):
+    # date_trunc returns a timestamp, SQLite's date() an ISO string
+    return day.date().isoformat() if isinstance(day, datetime) else str(day)
+
+
+# ----------------------------------------------------------------------------#
+# App Config.
+# ----------------------------------------------------------------------------#
+
+def create_app(test_config=None):
+    from flask_migrate import Migrate
+    from flask_moment import Moment
+    from sqlalchemy import func
+    from sqlalchemy.orm import joinedload
+
+    from forms import VenueForm, ArtistForm, ShowForm
+    from models import db, Venue, Artist, Show
+    from replicas import init_replicas
+    from search import search, genre_filter
+    from pagination import keyset_page
+    from counters import recount
+    from cache import cached_page, init_page_cache, VENUES_LISTING
+    import importer
+    import exporter
+    from logs import setup_logging, init_request_log
+    from sql_stats import init_sql_stats, query_budget
+    from scheduling import find_conflicts, conflicting_rows, available_venues
+    import autocomplete
+
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.update(test_config)
+    Moment(app)
+    init_replicas(app)
+    db.init_app(app)
+    Migrate(app, db)
+    init_page_cache(app)
+    app.jinja_env.filters['datetime'] = datetime_filter(app.config['DATETIME_FILTER_CACHE_SIZE'])
+
+    GENRES = [genre for genre, _ in VenueForm.genres.kwargs['choices']]
+
+    # ----------------------------------------------------------------------------#
+    # Controllers.
+    # ----------------------------------------------------------------------------#
+
+    @app.route('/')
+    def index():
+        return render_template('pages/home.html')
+
+    #  Venues
+    #  ----------------------------------------------------------------
+
+    def listing_page(model, columns, per_page):
+        query = model.query
+        filters = listing_filters()
+        if filters:
+            query = query.filter(genre_filter(model, filters['genre'], match_all=filters['match'] == 'all'))
+        try:
+            page = keyset_page(query, columns, per_page,
+                               after=request.args.get('after'), before=request.args.get('before'))
+        except ValueError:
+            abort(400)
+        page.filters = filters
+        return page
+
+    @app.route('/venues')
+    @query_budget(1)
+    @cached_page(lambda: VENUES_LISTING)
+    def venues():
+        # ordered by area first so grouping stays a single pass over the page
+        page = listing_page(Venue, [Venue.state, Venue.city, Venue.name, Venue.id],
+                            app.config['VENUES_PER_PAGE'])
+        return render_template('pages/venues.html', areas=group_venues_by_area(page.items), page=page,
+                               genres=GENRES)
+
+    @app.route('/venues/search', methods=['POST'])
+    @query_budget(3)
+    def search_venues():
+        search_term = request.form.get('search_term', '')
+        page = max(request.form.get('page', 1, type=int), 1)
+        per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+        count, result = search(Venue, search_term, page, per_page)
+        response = {
+            "count": count,
+            "data": result
+        }
+        return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                               page=page, has_next=page * per_page < count)
+
+    @app.route('/venues/<int:venue_id>')
+    @query_budget(1)
+    @cached_page(lambda venue_id: ('venue', venue_id))
+    def show_venue(venue_id):
+        venue = Venue.query.options(
+            joinedload(Venue.shows).joinedload(Show.artist)
+        ).filter(Venue.id == venue_id).first()
+        if venue is None:
+            abort(404)
+
+        venue.past_shows, venue.upcoming_shows = split_shows(venue.shows, datetime.now())
+        return render_template('pages/show_venue.html', venue=venue)
+
+    @app.route('/venues/availability')
+    @query_budget(3)
+    def venue_availability():
+        start = request.args.get('start', type=parse_date_arg)
+        end = request.args.get('end', type=parse_date_arg)
+        if start is None or end is None or end <= start:
+            abort(400)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = app.config['VENUES_PER_PAGE']
+
+        total, venues = available_venues(start, end, page, per_page)
+        return jsonify({
+            'success': True,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'total_venues': total,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'city': venue.city,
+                'state': venue.state
+            } for venue in venues]
+        })
+
+    #  Create Venue
+    #  ----------------------------------------------------------------
+
+    @app.route('/venues/create', methods=['GET'])
+    def create_venue_form():
+        form = VenueForm()
+        return render_template('forms/new_venue.html', form=form)
+
+    @app.route('/venues/create', methods=['POST'])
+    def create_venue_submission():
+        error = False
+        form = VenueForm(request.form)
+        validation = form.validate()
+        if not validation:
+            errors = form.errors
+            msg = list(errors.keys())
+            message = ','.join(msg)
+            flash('Improper values for ' + message + ' fields')
+            return redirect(url_for('create_venue_form'))
+
+        try:
+            venue = Venue(name=form.data['name'],
+                          city=form.data['city'],
+                          state=form.data['state'],
+                          address=form.data['address'],
+                          phone=form.data['phone'],
+                          facebook_link=form.data['facebook_link'],
+                          genres=form.data['genres'],
+                          image_link = form.data['image_link'])
+            db.session.add(venue)
+            db.session.commit()
+        except:
+            error = True
+            db.session.rollback()
+            app.logger.exception('Venue could not be listed')
+        finally:
+            db.session.close()
+
+        if error:
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+        else:
+            flash('Venue ' + request.form['name'] + ' was successfully listed!')
+
+        return redirect(url_for('index'))
+
+    @app.route('/venues/<venue_id>', methods=['DELETE'])
+    def delete_venue(venue_id):
+        # TODO: Complete this endpoint for taking a venue_id, and using
+        # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+        # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+        # clicking that button delete it from the db then redirect the user to the homepage
+        return None
+
+    #  Artists
+    #  ----------------------------------------------------------------
+    @app.route('/artists')
+    @query_budget(1)
+    def artists():
+        page = listing_page(Artist, [Artist.name, Artist.id], app.config['ARTISTS_PER_PAGE'])
+        return render_template('pages/artists.html', artists=page.items, page=page, genres=GENRES)
+
+    @app.route('/artists/search', methods=['POST'])
+    @query_budget(3)
+    def search_artists():
+        search_term = request.form.get('search_term', '')
+        page = max(request.form.get('page', 1, type=int), 1)
+        per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+        count, result = search(Artist, search_term, page, per_page)
+        response = {
+            "count": count,
+            "data": result
+        }
+        return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                               page=page, has_next=page * per_page < count)
+
+    @app.route('/artists/<int:artist_id>')
+    @query_budget(1)
+    @cached_page(lambda artist_id: ('artist', artist_id))
+    def show_artist(artist_id):
+        artist = Artist.query.options(
+            joinedload(Artist.shows).joinedload(Show.venue)
+        ).filter(Artist.id == artist_id).first()
+        if artist is None:
+            abort(404)
+
+        artist.past_shows, artist.upcoming_shows = split_shows(artist.shows, datetime.now())
+        return render_template('pages/show_artist.html', artist=artist)
+
+    #  Update
+    #  ----------------------------------------------------------------
+    @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+    def edit_artist(artist_id):
+        form = ArtistForm()
+        artist = {
+            "id": 4,
+            "name": "Guns N Petals",
+            "genres": ["Rock n Roll"],
+            "city": "San Francisco",
+            "state": "CA",
+            "phone": "326-123-5000",
+            "website": "https://www.gunsnpetalsband.com",
+            "facebook_link": "https://www.facebook.com/GunsNPetals",
+            "seeking_venue": True,
+            "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+            "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+        }
+        # TODO: populate form with fields from artist with ID <artist_id>
+        return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+    @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+    def edit_artist_submission(artist_id):
+        # TODO: take values from the form submitted, and update existing
+        # artist record with ID <artist_id> using the new attributes
+
+        return redirect(url_for('show_artist', artist_id=artist_id))
+
+    @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+    def edit_venue(venue_id):
+        form = VenueForm()
+        venue = {
+            "id": 1,
+            "name": "The Musical Hop",
+            "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+            "address": "1015 Folsom Street",
+            "city": "San Francisco",
+            "state": "CA",
+            "phone": "123-123-1234",
+            "website": "https://www.themusicalhop.com",
+            "facebook_link": "https://www.facebook.com/TheMusicalHop",
+            "seeking_talent": True,
+            "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+            "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+        }
+        # TODO: populate form with values from venue with ID <venue_id>
+        return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+    @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+    def edit_venue_submission(venue_id):
+        # TODO: take values from the form submitted, and update existing
+        # venue record with ID <venue_id> using the new attributes
+        return redirect(url_for('show_venue', venue_id=venue_id))
+
+    #  Create Artist
+    #  ----------------------------------------------------------------
+
+    @app.route('/artists/create', methods=['GET'])
+    def create_artist_form():
+        form = ArtistForm()
+        return render_template('forms/new_artist.html', form=form)
+
+    @app.route('/artists/create', methods=['POST'])
+    def create_artist_submission():
+        form = ArtistForm(request.form)
+        validation = form.validate()
+        if not validation:
+            errors = form.errors
+            msg = list(errors.keys())
+            message = ','.join(msg)
+            flash('Improper values for ' + message + ' fields')
+            return redirect(url_for('create_venue_form'))
+        error = False
+        try:
+            artist = Artist(name=form.data['name'],
+                            city=form.data['city'],
+                            state=form.data['state'],
+                            phone=form.data['phone'],
+                            facebook_link=form.data['facebook_link'],
+                            genres=form.data['genres'],
+                            image_link=form.data['image_link'],)
+
+            db.session.add(artist)
+            db.session.commit()
+        except:
+            error = True
+            db.session.rollback()
+            app.logger.exception('Artist could not be listed')
+        finally:
+            db.session.close()
+
+        if error:
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+        else:
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+
+        return redirect(url_for('index'))
+
+    #  ----------------------------------------------------------------
+    #  Shows
+    #  ----------------------------------------------------------------
+
+    @app.route('/shows')
+    @query_budget(1)
+    def shows():
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = request.args.get('limit', app.config['SHOWS_PER_PAGE'], type=int)
+        limit = min(max(limit, 1), app.config['SHOWS_MAX_PER_PAGE'])
+        start = request.args.get('from', type=parse_date_arg)
+        end = request.args.get('to', type=parse_date_arg)
+
+        # only the columns the tiles render, artist and venue joined in rather than lazy loaded per row
+        query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.artist_id,
+            Show.venue_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Venue.name.label('venue_name')
+        ).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+        if start is not None:
+            query = query.filter(Show.start_time >= start)
+        if end is not None:
+            query = query.filter(Show.start_time < end)
+
+        # fetch one extra row to know whether there is a next page without a count(*)
+        shows = query.order_by(Show.start_time, Show.id).offset((page - 1) * limit).limit(limit + 1).all()
+        has_next = len(shows) > limit
+
+        filters = {key: request.args[key] for key in ('from', 'to') if request.args.get(key)}
+        return render_template('pages/shows.html', shows=shows[:limit], page=page, limit=limit,
+                               has_next=has_next, filters=filters)
+
+    def show_day():
+        # truncate in the database so only one row per day and group comes back
+        if db.engine.dialect.name == 'postgresql':
+            return func.date_trunc('day', Show.start_time)
+        return func.date(Show.start_time)
+
+    @app.route('/calendar')
+    @query_budget(1)
+    def calendar():
+        start = request.args.get('start', type=parse_date_arg)
+        if start is None:
+            start = datetime.now()
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = request.args.get('end', type=parse_date_arg) or start + timedelta(days=30)
+        group = request.args.get('group', 'day')
+        if end <= start or end - start > timedelta(days=app.config['CALENDAR_MAX_DAYS']) \
+                or group not in ('day', 'venue', 'city'):
+            abort(400)
+
+        day = show_day().label('day')
+        columns = [day]
+        if group == 'venue':
+            columns += [Venue.id.label('venue_id'), Venue.name.label('venue_name')]
+        elif group == 'city':
+            columns += [Venue.city, Venue.state]
+
+        # the start_time range is served by ix_show_start_time
+        query = db.session.query(*columns + [func.count(Show.id).label('count')]) \
+            .filter(Show.start_time >= start).filter(Show.start_time < end)
+        if group != 'day':
+            query = query.join(Venue, Show.venue_id == Venue.id)
+        rows = query.group_by(*columns).order_by(*columns).all()
+
+        days = []
+        for row in rows:
+            entry = row._asdict()
+            entry['day'] = day_key(row.day)
+            days.append(entry)
+
+        if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+            return jsonify({
+                'success': True,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'group': group,
+                'days': days,
+                'total_shows': sum(entry['count'] for entry in days)
+            })
+        return render_template('pages/calendar.html', days=days, group=group, start=start, end=end)
+
+    @app.route('/shows/create', methods=['GET'])
+    def create_shows():
+        # renders form. do not touch.
+        form = ShowForm()
+        return render_template('forms/new_show.html', form=form)
+
+    @app.route('/shows/create', methods=['POST'])
+    def create_show_submission():
+        form = ShowForm(request.form)
+        validation = form.validate()
+        if not validation:
+            errors = form.errors
+            msg = list(errors.keys())
+            message = ','.join(msg)
+            flash('Improper values for ' + message + ' fields')
+            return redirect(url_for('create_shows'))
+        try:
+            conflicts = find_conflicts(int(form.data['venue_id']), form.data['start_time'],
+                                       form.data['duration_minutes'])
+        except ValueError:
+            flash('Improper values for venue_id fields')
+            return redirect(url_for('create_shows'))
+        if conflicts:
+            flash('The venue is already booked at that time.')
+            return redirect(url_for('create_shows'))
+
+        error = False
+        try:
+            show = Show(artist_id=form.data['artist_id'],
+                        venue_id=form.data['venue_id'],
+                        start_time=form.data['start_time'],
+                        duration_minutes=form.data['duration_minutes'])
+            db.session.add(show)
+            db.session.commit()
+        except:
+            error = True
+            db.session.rollback()
+            app.logger.exception('Show could not be listed')
+        finally:
+            db.session.close()
+
+        if error:
+            flash('An error occurred. Show could not be listed.')
+        else:
+            flash('Show was successfully listed!')
+
+        return redirect(url_for('index'))
+
+    @app.route('/shows/batch', methods=['POST'])
+    def create_shows_batch():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            abort(400)
+        records = body.get('shows')
+        if not isinstance(records, list) or not records or len(records) > app.config['SHOWS_BATCH_MAX']:
+            abort(400)
+
+        results = [{'index': index} for index in range(len(records))]
+        valid = []
+        for index, fields in enumerate(records):
+            if not isinstance(fields, dict):
+                results[index]['errors'] = {'show': ['must be an object']}
+                continue
+            row, errors = importer.validate(ShowForm, Show.__table__, fields)
+            if errors:
+                results[index]['errors'] = errors
+            else:
+                valid.append((index, row))
+
+        valid, rejected = importer.check_show_references(valid)
+        for index, errors in rejected:
+            results[index]['errors'] = errors
+
+        colliding = conflicting_rows([row for _, row in valid])
+        for position in colliding:
+            results[valid[position][0]]['errors'] = {'start_time': ['venue is already booked at that time']}
+        valid = [record for position, record in enumerate(valid) if position not in colliding]
+
+        # all or nothing: a tour with one bad date is sent back whole
+        if len(valid) < len(records):
+            return jsonify({
+                'success': False,
+                'error': 422,
+                'message': 'unprocessable',
+                'results': results
+            }), 422
+
+        shows = [Show(**row) for _, row in valid]
+        try:
+            db.session.add_all(shows)
+            db.session.flush()
+            # read the ids before commit expires them, otherwise each one is a refresh query
+            for (index, _), show in zip(valid, shows):
+                results[index]['id'] = show.id
+            db.session.commit()
+        except:
+            db.session.rollback()
+            app.logger.exception('Show batch could not be listed')
+            abort(500)
+        finally:
+            db.session.close()
+
+        return jsonify({
+            'success': True,
+            'created': len(shows),
+            'results': results
+        }), 201
+
+    #  Autocomplete
+    #  ----------------------------------------------------------------
+
+    @app.route('/autocomplete')
+    @query_budget(len(autocomplete.KINDS))
+    def autocomplete_names():
+        prefix = request.args.get('q', '').strip()
+        kinds = request.args.getlist('kind') or sorted(autocomplete.KINDS)
+        if any(kind not in autocomplete.KINDS for kind in kinds):
+            abort(400)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), app.config['AUTOCOMPLETE_MAX_RESULTS'])
+
+        results = []
+        if prefix:
+            for kind in kinds:
+                matches = autocomplete.names.lookup(autocomplete.KINDS[kind], prefix, limit,
+                                                    app.config['AUTOCOMPLETE_TTL'])
+                results += [{'type': kind, 'id': id, 'name': name} for id, name in matches]
+        return jsonify({
+            'success': True,
+            'q': prefix,
+            'results': results
+        })
+
+    #  Export
+    #  ----------------------------------------------------------------
+
+    @app.route('/export/<kind>')
+    def export(kind):
+        file_format = request.args.get('format', 'csv')
+        if kind not in exporter.EXPORT_COLUMNS or file_format not in exporter.FORMATS:
+            abort(404)
+
+        rows = exporter.export_rows(kind, file_format, app.config['EXPORT_BATCH_SIZE'])
+        response = Response(stream_with_context(rows), mimetype=exporter.FORMATS[file_format])
+        response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, file_format)
+        return response
+
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return render_template('errors/404.html'), 404
+
+    @app.errorhandler(500)
+    def server_error(error):
+        return render_template('errors/500.html'), 500
+
+    # ----------------------------------------------------------------------------#
+    # Commands.
+    # ----------------------------------------------------------------------------#
+
+    counters_cli = AppGroup('counters', help='Maintain the upcoming/past show counters.')
+
+    @counters_cli.command('rollover')
+    @click.option('--window', default=24, show_default=True,
+                  help='Hours of start times to re-check, must exceed the interval between runs.')
+    def rollover_counters(window):
+        """Move shows that have started since the last run from upcoming to past."""
+        now = datetime.now()
+        updated = recount(now, since=now - timedelta(hours=window))
+        click.echo('Rolled over counters on {} venues/artists'.format(updated))
+
+    @counters_cli.command('reconcile')
+    def reconcile_counters():
+        """Rebuild every counter from the Show table."""
+        updated = recount(datetime.now())
+        click.echo('Reconciled counters on {} venues/artists'.format(updated))
+
+    app.cli.add_command(counters_cli)
+
+    @app.cli.command('import')
+    @click.argument('kind', type=click.Choice(sorted(importer.KINDS)))
+    @click.argument('file', type=click.File('r'))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+                  help='Defaults to the file extension.')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows per transaction.')
+    def import_command(kind, file, file_format, batch_size):
+        """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+        if file_format is None:
+            file_format = 'ndjson' if file.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+        result = importer.import_rows(kind, importer.read_rows(file, file_format), batch_size)
+        if kind == 'shows':
+            recount(datetime.now())
+
+        for number, errors in result.rejected[:20]:
+            click.echo('line {}: {}'.format(number, errors), err=True)
+        click.echo('Imported {} {} in {:.1f}s ({:.0f} rows/s), rejected {}'.format(
+            result.inserted, kind, result.seconds, result.rows_per_second, len(result.rejected)))
+
+    @app.cli.command('export')
+    @click.argument('kind', type=click.Choice(sorted(exporter.EXPORT_COLUMNS)))
+    @click.argument('file', type=click.File('w'), default='-')
+    @click.option('--format', 'file_format', type=click.Choice(sorted(exporter.FORMATS)), default='csv',
+                  show_default=True)
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+    def export_command(kind, file, file_format, batch_size):
+        """Stream venues, artists or shows to a CSV or NDJSON file (stdout by default)."""
+        for chunk in exporter.export_rows(kind, file_format, batch_size):
+            file.write(chunk)
+
+    init_sql_stats(app)
+    init_request_log(app)
+    if not app.debug:
+        setup_logging(app)
+
+    return app
+
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -360,11 +726,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
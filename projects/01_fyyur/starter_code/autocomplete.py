@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from sqlalchemy import event, inspect
+
+from models import db, Venue, Artist
+from search import normalize
+
+
+# ----------------------------------------------------------------------------#
+# Autocomplete.
+#
+# Venue and artist names live in sorted arrays in memory, so a keystroke is
+# a bisect and never a query. Each name is filed under every word it has,
+# so "hop" finds "The Musical Hop". The arrays are loaded on first use and
+# then patched when a write commits in this process. Writes made by other
+# processes show up when the index expires after AUTOCOMPLETE_TTL seconds.
+# ----------------------------------------------------------------------------#
+
+KINDS = {
+    'venues': Venue,
+    'artists': Artist,
+}
+
+
+def name_keys(name):
+    words = normalize(name).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    def __init__(self, rows=()):
+        self.entries = sorted((key, name, id) for id, name in rows for key in name_keys(name))
+        self.built_at = time.monotonic()
+
+    def add(self, id, name):
+        for key in name_keys(name):
+            insort(self.entries, (key, name, id))
+
+    def remove(self, id, name):
+        for key in name_keys(name):
+            position = bisect_left(self.entries, (key, name, id))
+            if position < len(self.entries) and self.entries[position] == (key, name, id):
+                del self.entries[position]
+
+    def lookup(self, prefix, limit):
+        """Up to `limit` (id, name) pairs with a word starting with `prefix`."""
+        prefix = normalize(prefix)
+        found = {}
+        position = bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(found) < limit:
+            key, name, id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(id, name)
+            position += 1
+        return list(found.items())
+
+
+class Autocomplete:
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index(self, model, ttl):
+        index = self.indexes.get(model)
+        if index is None or time.monotonic() - index.built_at > ttl:
+            rows = db.session.query(model.id, model.name).filter(model.name.isnot(None)).all()
+            index = self.indexes[model] = PrefixIndex(rows)
+        return index
+
+    def lookup(self, model, prefix, limit, ttl):
+        with self.lock:
+            return self.index(model, ttl).lookup(prefix, limit)
+
+    def apply(self, changes):
+        with self.lock:
+            for change, model, id, name in changes:
+                index = self.indexes.get(model)
+                if index is not None and name:
+                    getattr(index, change)(id, name)
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+
+names = Autocomplete()
+
+
+# ----------------------------------------------------------------------------#
+# Incremental updates, applied once the transaction commits.
+# ----------------------------------------------------------------------------#
+
+def pending(target, *changes):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('autocomplete', []).extend(changes)
+
+
+def inserted(mapper, connection, target):
+    pending(target, ('add', type(target), target.id, target.name))
+
+
+def updated(mapper, connection, target):
+    history = inspect(target).attrs.name.history
+    if history.deleted:
+        pending(target, ('remove', type(target), target.id, history.deleted[0]),
+                ('add', type(target), target.id, target.name))
+
+
+def deleted(mapper, connection, target):
+    pending(target, ('remove', type(target), target.id, target.name))
+
+
+def apply_committed(session):
+    changes = session.info.pop('autocomplete', None)
+    if changes:
+        names.apply(changes)
+
+
+def forget_rolled_back(session, previous_transaction):
+    session.info.pop('autocomplete', None)
+
+
+for model in KINDS.values():
+    event.listen(model, 'after_insert', inserted)
+    event.listen(model, 'after_update', updated)
+    event.listen(model, 'after_delete', deleted)
+event.listen(db.session, 'after_commit', apply_committed)
+event.listen(db.session, 'after_soft_rollback', forget_rolled_back)
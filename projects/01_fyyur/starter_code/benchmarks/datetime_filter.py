@@ -0,0 +1,71 @@
+"""Render cost of the `datetime` Jinja filter for 10k show tiles.
+
+Compares the old strftime -> dateutil -> babel round trip with the native
+filter in app.py, cold (empty memo) and warm (every value memoized, as on
+a repeated page view).
+
+    python benchmarks/datetime_filter.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+
+from app import datetime_filter, datetime_pattern
+
+SHOWS = 10000
+
+format_datetime = datetime_filter(SHOWS)
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def render_legacy(start_times):
+    for start_time in start_times:
+        legacy_format_datetime(start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'full')
+
+
+def render_native(start_times):
+    for start_time in start_times:
+        format_datetime(start_time, 'full')
+
+
+def best_of(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    first = datetime(2020, 5, 21, 21, 30)
+    start_times = [first + timedelta(hours=3 * i) for i in range(SHOWS)]
+
+    legacy = best_of(lambda: render_legacy(start_times))
+
+    def cold():
+        format_datetime.cache_clear()
+        datetime_pattern.cache_clear()
+        render_native(start_times)
+
+    native_cold = best_of(cold)
+    render_native(start_times)
+    native_warm = best_of(lambda: render_native(start_times))
+
+    print('{:<28}{:>12}'.format('per {} shows'.format(SHOWS), 'ms'))
+    print('{:<28}{:>12.1f}'.format('strftime + dateutil + babel', legacy * 1000))
+    print('{:<28}{:>12.1f}'.format('native, cold memo', native_cold * 1000))
+    print('{:<28}{:>12.1f}'.format('native, warm memo', native_warm * 1000))
+
+
+if __name__ == '__main__':
+    main()
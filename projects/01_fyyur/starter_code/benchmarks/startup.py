@@ -0,0 +1,61 @@
+"""Cold start cost of the app: module import, create_app() and first request.
+
+Every sample runs in a fresh interpreter so nothing is already imported.
+`import app` is what a pre-fork server pays once when preloading; the
+create_app() and first-request columns are what each worker (or each test
+setUp) adds on top. The last line checks that dateutil is still unloaded
+after create_app(), i.e. deferred to the first request that parses a
+date. babel itself is pulled in by flask_wtf's i18n support, only its
+CLDR pattern and locale parsing is deferred.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+instance = app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+created = time.perf_counter()
+deferred = 'dateutil' not in sys.modules
+instance.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'deferred': deferred,
+}))
+'''
+
+
+def sample():
+    output = subprocess.run([sys.executable, '-c', SAMPLE], cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    print('{:<16} {:>10} {:>10}'.format('phase', 'median ms', 'max ms'))
+    for phase in ('import', 'create_app', 'first_request'):
+        timings = [run[phase] * 1000 for run in samples]
+        print('{:<16} {:>10.1f} {:>10.1f}'.format(phase, statistics.median(timings), max(timings)))
+    print('dateutil deferred past create_app: {}'.format(all(run['deferred'] for run in samples)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+from sqlalchemy import event, inspect, select
+
+from models import db, Venue, Artist, Show
+from replicas import replica_may_lag
+
+
+# ----------------------------------------------------------------------------#
+# Page cache.
+# ----------------------------------------------------------------------------#
+
+class PageCache:
+    """Bounded LRU of rendered pages with a TTL.
+
+    Entries are filed under a group (e.g. ('venue', 1)) so that every variant
+    of a page, such as each cursor of the /venues listing, can be dropped at once.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.groups = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, group, variant=None):
+        key = (group, variant)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, group, value, variant=None):
+        key = (group, variant)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            self.groups.setdefault(group, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, *groups):
+        with self.lock:
+            for group in groups:
+                for key in self.groups.pop(group, ()):
+                    self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.groups.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, key):
+        del self.entries[key]
+        variants = self.groups.get(key[0])
+        if variants is not None:
+            variants.discard(key)
+            if not variants:
+                del self.groups[key[0]]
+
+
+page_cache = PageCache(1000, 300)
+
+
+def init_page_cache(app):
+    with page_cache.lock:
+        page_cache.max_entries = app.config['PAGE_CACHE_SIZE']
+        page_cache.ttl = app.config['PAGE_CACHE_TTL']
+
+
+def cached_page(group):
+    """Serve the view's rendered HTML from page_cache; `group` maps the view kwargs to a group."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pending flash messages get rendered into the page, never cache those
+            if not current_app.config['PAGE_CACHE_ENABLED'] or session.get('_flashes'):
+                return view(**kwargs)
+
+            key = group(**kwargs)
+            variant = request.query_string or None
+            body = page_cache.get(key, variant)
+            if body is not None:
+                response = make_response(body)
+                response.headers['X-Page-Cache'] = 'hit'
+                return response
+
+            body = view(**kwargs)
+            # the commit that just invalidated this page may not have reached the replica
+            if isinstance(body, str) and not replica_may_lag():
+                page_cache.set(key, body, variant)
+            response = make_response(body)
+            response.headers['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Invalidation.
+#
+# Flushes record which pages a write touches and the pages are dropped
+# when the transaction commits, not at flush, so readers in between can't
+# put the pre-commit rows back. The TTL bounds any remaining race.
+# ----------------------------------------------------------------------------#
+
+VENUES_LISTING = ('venues',)
+
+
+def stale(target, *groups):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('stale_pages', set()).update(groups)
+
+
+def old_and_new(target, key):
+    history = inspect(target).attrs[key].history
+    return set(history.deleted) | {getattr(target, key)}
+
+
+def venue_inserted(mapper, connection, venue):
+    stale(venue, VENUES_LISTING)
+
+
+def venue_changed(mapper, connection, venue):
+    # the venue's name and image are shown on the page of every artist playing there
+    artist_ids = connection.execute(
+        select([Show.artist_id]).where(Show.venue_id == venue.id).distinct()
+    )
+    stale(venue, VENUES_LISTING, ('venue', venue.id), *[('artist', row[0]) for row in artist_ids])
+
+
+def artist_changed(mapper, connection, artist):
+    # the artist's name and image are shown on every venue page they play
+    venue_ids = connection.execute(
+        select([Show.venue_id]).where(Show.artist_id == artist.id).distinct()
+    )
+    stale(artist, ('artist', artist.id), *[('venue', row[0]) for row in venue_ids])
+
+
+def show_changed(mapper, connection, show):
+    groups = [('venue', id) for id in old_and_new(show, 'venue_id')]
+    groups += [('artist', id) for id in old_and_new(show, 'artist_id')]
+    stale(show, *groups)
+
+
+def invalidate_committed(session):
+    groups = session.info.pop('stale_pages', None)
+    if groups:
+        page_cache.invalidate(*groups)
+
+
+def forget_rolled_back(session, previous_transaction):
+    session.info.pop('stale_pages', None)
+
+
+event.listen(Venue, 'after_insert', venue_inserted)
+event.listen(Venue, 'after_update', venue_changed)
+event.listen(Venue, 'before_delete', venue_changed)
+event.listen(Artist, 'after_update', artist_changed)
+event.listen(Artist, 'before_delete', artist_changed)
+for change in ('after_insert', 'after_update', 'before_delete'):
+    event.listen(Show, change, show_changed)
+event.listen(db.session, 'after_commit', invalidate_committed)
+event.listen(db.session, 'after_soft_rollback', forget_rolled_back)
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select
+
+from models import db, Venue, Artist, Show
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+#
+# Venue/Artist.upcoming_shows_count and past_shows_count are adjusted in
+# the same flush that inserts, moves or deletes a Show: each change adds
+# to a per-flush tally and after_flush sends one UPDATE per distinct delta,
+# so a 50 date tour costs a couple of statements, not 100. Shows drift
+# from upcoming to past as time passes, so `flask counters rollover` must
+# run periodically (e.g. hourly from cron) and `flask counters reconcile`
+# rebuilds every row from the Show table if they ever disagree.
+# ----------------------------------------------------------------------------#
+
+COUNTED = (
+    (Venue, Show.venue_id, 'venue_id'),
+    (Artist, Show.artist_id, 'artist_id'),
+)
+
+
+def as_datetime(value):
+    # shows built straight from request data may carry the raw string
+    if value is None or isinstance(value, datetime):
+        return value
+    import dateutil.parser
+
+    return dateutil.parser.parse(value)
+
+
+def adjust(show, values, delta, now=None):
+    start_time = as_datetime(values['start_time'])
+    session = inspect(show).session
+    if start_time is None or session is None:
+        return
+
+    now = now or datetime.now()
+    column = 'upcoming_shows_count' if start_time >= now else 'past_shows_count'
+    tally = session.info.setdefault('show_counts', {})
+    for model, _, key in COUNTED:
+        counts = tally.setdefault((model, values[key]), {})
+        counts[column] = counts.get(column, 0) + delta
+
+
+def tracked_values(show):
+    return {key: getattr(show, key) for key in ('start_time', 'venue_id', 'artist_id')}
+
+
+def show_inserted(mapper, connection, show):
+    adjust(show, tracked_values(show), 1)
+
+
+def show_deleted(mapper, connection, show):
+    adjust(show, tracked_values(show), -1)
+
+
+def show_updated(mapper, connection, show):
+    state = inspect(show)
+    old = {}
+    for key in ('start_time', 'venue_id', 'artist_id'):
+        history = state.attrs[key].history
+        old[key] = history.deleted[0] if history.deleted else getattr(show, key)
+
+    new = tracked_values(show)
+    if old != new:
+        adjust(show, old, -1)
+        adjust(show, new, 1)
+
+
+def apply_counts(session, flush_context):
+    # rows that moved by the same amounts share one UPDATE ... WHERE id IN (...)
+    groups = {}
+    for (model, id), counts in session.info.pop('show_counts', {}).items():
+        counts = tuple(sorted((column, delta) for column, delta in counts.items() if delta))
+        if counts:
+            groups.setdefault((model, counts), []).append(id)
+
+    for (model, counts), ids in groups.items():
+        table = model.__table__
+        session.execute(table.update().where(table.c.id.in_(ids)).values(
+            {column: table.c[column] + delta for column, delta in counts}))
+
+
+def forget_counts(session, previous_transaction):
+    session.info.pop('show_counts', None)
+
+
+event.listen(Show, 'after_insert', show_inserted)
+event.listen(Show, 'before_delete', show_deleted)
+event.listen(Show, 'after_update', show_updated)
+event.listen(db.session, 'after_flush', apply_counts)
+event.listen(db.session, 'after_soft_rollback', forget_counts)
+
+
+def recount(now, since=None):
+    """Recompute counters from the Show table.
+
+    With `since`, only venues/artists with a show starting in [since, now) are
+    touched, which is what moves shows from upcoming to past. Without it every
+    row is rebuilt. Returns the number of venue and artist rows updated.
+    """
+    updated = 0
+    for model, foreign_key, _ in COUNTED:
+        shows = select([func.count(Show.id)]).where(foreign_key == model.id)
+        statement = model.__table__.update().values(
+            upcoming_shows_count=shows.where(Show.start_time >= now).as_scalar(),
+            past_shows_count=shows.where(Show.start_time < now).as_scalar()
+        )
+        if since is not None:
+            started = select([foreign_key]).where(Show.start_time >= since).where(Show.start_time < now)
+            statement = statement.where(model.id.in_(started))
+        updated += db.session.execute(statement).rowcount
+    db.session.commit()
+    return updated
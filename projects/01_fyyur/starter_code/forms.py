@@ -1,7 +1,9 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, NumberRange
+
+from models import SHOW_DEFAULT_MINUTES, SHOW_MAX_MINUTES
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +17,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=SHOW_MAX_MINUTES)],
+        default=SHOW_DEFAULT_MINUTES
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+from scheduling import conflicting_rows
+
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Rows are validated with the same forms the create pages use, then written
+# in batches: one transaction per batch, COPY on Postgres and executemany
+# elsewhere (one statement per set of non-empty columns). Shows that double
+# book a venue are rejected row by row before the batch is written. COPY
+# skips the ORM, so show counters are rebuilt once at the end rather than
+# bumped per row.
+# ----------------------------------------------------------------------------#
+
+KINDS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream, file_format):
+    """Yield (line number, field dict) pairs from a CSV or NDJSON stream."""
+    if file_format == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                yield number, json.loads(line)
+    else:
+        # line 1 is the header
+        for number, row in enumerate(csv.DictReader(stream), 2):
+            if row.get('genres'):
+                # commas belong to CSV, genres are separated with semicolons
+                row['genres'] = [genre.strip() for genre in row['genres'].split(';') if genre.strip()]
+            yield number, row
+
+
+def validate(form_class, table, fields):
+    """Returns (row, None) for a valid record or (None, errors)."""
+    formdata = MultiDict()
+    for key, value in fields.items():
+        if isinstance(value, list):
+            formdata.setlist(key, [str(item) for item in value])
+        elif value is not None:
+            formdata[key] = str(value)
+
+    form = form_class(formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+
+    # empty fields are left out so column defaults (e.g. duration_minutes) apply
+    row = {}
+    for key, value in form.data.items():
+        if key in table.c and value not in ('', None):
+            row[key] = value
+    return row, None
+
+
+def check_show_references(rows):
+    """Split show rows into those whose artist and venue exist and the rest."""
+    valid, rejected = [], []
+    for number, row in rows:
+        try:
+            row['artist_id'] = int(row.get('artist_id'))
+            row['venue_id'] = int(row.get('venue_id'))
+        except (TypeError, ValueError):
+            rejected.append((number, {'artist_id/venue_id': ['must be integers']}))
+        else:
+            valid.append((number, row))
+
+    # one IN query per table for the whole batch
+    artist_ids = {row['artist_id'] for _, row in valid}
+    venue_ids = {row['venue_id'] for _, row in valid}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+
+    rows, valid = valid, []
+    for number, row in rows:
+        if row['artist_id'] in known_artists and row['venue_id'] in known_venues:
+            valid.append((number, row))
+        else:
+            rejected.append((number, {'artist_id/venue_id': ['unknown artist or venue']}))
+    return valid, rejected
+
+
+def copy_literal(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value
+        ) + '}'
+    return value
+
+
+def insert_batch(table, rows):
+    # rows leave out their empty fields, each set of columns is its own statement
+    by_columns = {}
+    for row in rows:
+        by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    for columns, column_rows in by_columns.items():
+        if db.engine.dialect.name == 'postgresql':
+            copy_rows(table, columns, column_rows)
+        else:
+            db.session.execute(table.insert(), column_rows)
+
+
+def copy_rows(table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_literal(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name, ', '.join('"{}"'.format(column) for column in columns)), buffer)
+
+
+def import_rows(kind, records, batch_size=5000):
+    """Validate and insert `records` ((line number, fields) pairs) as `kind`."""
+    model, form_class = KINDS[kind]
+    table = model.__table__
+    result = ImportResult()
+    started = time.perf_counter()
+
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+
+        valid = []
+        for number, fields in batch:
+            row, errors = validate(form_class, table, fields)
+            if errors:
+                result.rejected.append((number, errors))
+            else:
+                valid.append((number, row))
+        if kind == 'shows' and valid:
+            valid, rejected = check_show_references(valid)
+            result.rejected.extend(rejected)
+            # one overlapping show would otherwise fail the whole batch on Postgres
+            # (and go in unnoticed elsewhere)
+            colliding = conflicting_rows([row for _, row in valid])
+            result.rejected.extend((number, {'start_time': ['venue is already booked at that time']})
+                                   for position, (number, _) in enumerate(valid) if position in colliding)
+            valid = [record for position, record in enumerate(valid) if position not in colliding]
+        if not valid:
+            continue
+
+        try:
+            insert_batch(table, [row for _, row in valid])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            result.rejected.extend((number, {'batch': [str(e)]}) for number, _ in valid)
+        else:
+            result.inserted += len(valid)
+
+    result.seconds = time.perf_counter() - started
+    return result
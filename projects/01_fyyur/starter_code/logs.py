@@ -0,0 +1,138 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import time
+from logging import Formatter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, request
+
+from sql_stats import current_stats
+
+
+# ----------------------------------------------------------------------------#
+# Logging.
+#
+# Request threads only put records on an in-memory queue. A QueueListener
+# thread formats them and writes the size-rotated log files, so disk I/O
+# never runs on a request. Besides the error log, every request leaves one
+# JSON line in the request log with its route, status, duration and the
+# SQL statements it ran, as counted by sql_stats.
+#
+# Size-based rollover assumes one writer per file. A worker forked from a
+# preloaded app (gunicorn --preload) therefore switches to files of its
+# own, error.<slot>.log and requests.<slot>.log, and rotates only those.
+# The slot is the lowest number no live worker holds a lock on, so a
+# restarted worker takes over the files of the one it replaces and there
+# are never more sets of files than workers running at once.
+# ----------------------------------------------------------------------------#
+
+request_logger = logging.getLogger('fyyur.requests')
+
+
+class JsonFormatter(Formatter):
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'message': record.getMessage()}
+        entry.update(getattr(record, 'request', {}))
+        return json.dumps(entry)
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def log_request(response):
+    stats = current_stats()
+    if 'request_started' in g and stats is not None:
+        request_logger.info('request', extra={'request': {
+            'method': request.method,
+            'route': request.url_rule.rule if request.url_rule else request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 2),
+            'sql_count': stats.count,
+            'sql_ms': round(stats.seconds * 1000, 2),
+        }})
+    return response
+
+
+def rotating_handler(app, filename, formatter):
+    handler = RotatingFileHandler(filename, maxBytes=app.config['LOG_MAX_BYTES'],
+                                  backupCount=app.config['LOG_BACKUP_COUNT'])
+    handler.setFormatter(formatter)
+    return handler
+
+
+def worker_filename(filename, slot):
+    root, ext = os.path.splitext(filename)
+    return '{}.{}{}'.format(root, slot, ext)
+
+
+def claim_slot(filename):
+    """Lowest free worker slot for `filename` and the open lock that holds it.
+
+    The lock is released by the kernel when the worker exits, however it exits.
+    """
+    slot = 0
+    while True:
+        lock = open(worker_filename(filename, slot) + '.lock', 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return slot, lock
+        except BlockingIOError:
+            lock.close()
+            slot += 1
+
+
+def reopen_in_worker(listener):
+    # the parent's handlers still point at its files and its writer thread
+    # didn't survive the fork: move to the files of a free slot, start a new
+    # writer. Records queued before the fork are the parent's to write, and its
+    # writer may have held the queue's lock, so the queue starts over empty.
+    listener.queue.__init__(listener.queue.maxsize)
+    listener.slot, listener.slot_lock = claim_slot(listener.handlers[0].baseFilename)
+    for handler in listener.handlers:
+        if handler.stream is not None:
+            handler.stream.close()
+            handler.stream = None
+        handler.baseFilename = worker_filename(handler.baseFilename, listener.slot)
+    listener._thread = None
+    listener.start()
+
+
+_listener = None
+
+
+def setup_logging(app):
+    """Route app.logger and per-request records through a background writer."""
+    global _listener
+    # loggers are process wide, apps created after the first reuse the writer
+    if _listener is not None:
+        return _listener
+    records = queue.Queue(-1)
+
+    error_handler = rotating_handler(app, app.config['LOG_FILE'], Formatter(
+        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    error_handler.addFilter(lambda record: record.name != request_logger.name)
+    request_handler = rotating_handler(app, app.config['REQUEST_LOG_FILE'], JsonFormatter())
+    request_handler.addFilter(lambda record: record.name == request_logger.name)
+
+    listener = _listener = QueueListener(records, error_handler, request_handler)
+    listener.start()
+    os.register_at_fork(after_in_child=lambda: reopen_in_worker(listener))
+    # flush what is still queued when the process exits
+    atexit.register(listener.stop)
+
+    for logger in (app.logger, request_logger):
+        logger.addHandler(QueueHandler(records))
+        logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+    return listener
+
+
+def init_request_log(app):
+    """Emit one fyyur.requests record per request, needs init_sql_stats first."""
+    app.before_request(start_timer)
+    app.after_request(log_request)
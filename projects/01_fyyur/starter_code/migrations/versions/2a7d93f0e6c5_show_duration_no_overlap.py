@@ -0,0 +1,51 @@
+"""show durations and the no-double-booking exclusion constraint
+
+Revision ID: 2a7d93f0e6c5
+Revises: 9c5b2e8d41a7
+Create Date: 2026-10-18 15:32:18.226801
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7d93f0e6c5'
+down_revision = '9c5b2e8d41a7'
+branch_labels = None
+depends_on = None
+
+
+# Must match models.SHOW_PERIOD.
+SHOW_PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+OVERLAPS = """
+SELECT a.id, b.id FROM "Show" a JOIN "Show" b
+    ON a.venue_id = b.venue_id AND a.id < b.id
+    AND tsrange(a.start_time, a.start_time + a.duration_minutes * interval '1 minute')
+     && tsrange(b.start_time, b.start_time + b.duration_minutes * interval '1 minute')
+LIMIT 20
+"""
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+
+    # SQLite has no range types, scheduling.py checks conflicts in the application
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    overlapping = op.get_bind().execute(sa.text(OVERLAPS)).fetchall()
+    if overlapping:
+        raise RuntimeError('Shows double book a venue, fix them before upgrading: {}'.format(
+            ', '.join('{}/{}'.format(a, b) for a, b in overlapping)))
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT show_venue_no_overlap '
+               'EXCLUDE USING gist (venue_id WITH =, {} WITH &&)'.format(SHOW_PERIOD))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('show_venue_no_overlap', 'Show')
+    op.drop_column('Show', 'duration_minutes')
@@ -0,0 +1,38 @@
+"""trigram search indexes for venues and artists
+
+Revision ID: 3f2c9b1d7a64
+Revises: 8a84353f534a
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2c9b1d7a64'
+down_revision = '8a84353f534a'
+branch_labels = None
+depends_on = None
+
+
+# Must match search.search_text() so the planner can use the index, and models.SEARCH_TEXT.
+SEARCH_TEXT = "lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, ''))"
+
+
+def upgrade():
+    # SQLite databases are searched through the in-process inverted index in search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_venue_search_trgm ON "Venue" USING gin ({} gin_trgm_ops)'.format(SEARCH_TEXT))
+    op.execute('CREATE INDEX ix_artist_search_trgm ON "Artist" USING gin ({} gin_trgm_ops)'.format(SEARCH_TEXT))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_artist_search_trgm', table_name='Artist')
+    op.drop_index('ix_venue_search_trgm', table_name='Venue')
@@ -0,0 +1,24 @@
+"""index backing keyset pagination of the artist listing
+
+Revision ID: 5d08e6a3c2f1
+Revises: b71e4c0a9f25
+Create Date: 2026-10-18 11:20:05.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d08e6a3c2f1'
+down_revision = 'b71e4c0a9f25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_id', table_name='Artist')
@@ -0,0 +1,38 @@
+"""listing sort keys NOT NULL, keyset cursors never match a NULL
+
+Revision ID: 6b3e0d5f8a21
+Revises: 2a7d93f0e6c5
+Create Date: 2026-10-19 10:04:37.615902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b3e0d5f8a21'
+down_revision = '2a7d93f0e6c5'
+branch_labels = None
+depends_on = None
+
+
+KEYS = {
+    'Venue': [('name', sa.String()), ('city', sa.String(120)), ('state', sa.String(120))],
+    'Artist': [('name', sa.String())],
+}
+
+
+def upgrade():
+    for table, columns in KEYS.items():
+        for column, column_type in columns:
+            op.execute('UPDATE "{0}" SET {1} = \'\' WHERE {1} IS NULL'.format(table, column))
+        with op.batch_alter_table(table) as batch:
+            for column, column_type in columns:
+                batch.alter_column(column, existing_type=column_type, nullable=False)
+
+
+def downgrade():
+    for table, columns in KEYS.items():
+        with op.batch_alter_table(table) as batch:
+            for column, column_type in columns:
+                batch.alter_column(column, existing_type=column_type, nullable=True)
@@ -0,0 +1,33 @@
+"""GIN indexes on venue and artist genres
+
+Revision ID: 9c5b2e8d41a7
+Revises: e4a1f7c93b08
+Create Date: 2026-10-18 14:05:33.671420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5b2e8d41a7'
+down_revision = 'e4a1f7c93b08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite keeps genres as JSON and filters them with json_each, there is nothing to index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_index('ix_venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_artist_genres', table_name='Artist')
+    op.drop_index('ix_venue_genres', table_name='Venue')
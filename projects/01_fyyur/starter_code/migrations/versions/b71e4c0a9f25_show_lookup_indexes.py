@@ -0,0 +1,30 @@
+"""composite indexes for show lookups and the venue listing
+
+Revision ID: b71e4c0a9f25
+Revises: 3f2c9b1d7a64
+Create Date: 2026-10-18 10:03:27.550913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e4c0a9f25'
+down_revision = '3f2c9b1d7a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'Show', ['start_time'], unique=False)
+    op.create_index('ix_venue_state_city_name', 'Venue', ['state', 'city', 'name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city_name', table_name='Venue')
+    op.drop_index('ix_show_start_time', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
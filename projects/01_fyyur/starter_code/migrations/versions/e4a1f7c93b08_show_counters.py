@@ -0,0 +1,41 @@
+"""denormalized upcoming/past show counters on venues and artists
+
+Revision ID: e4a1f7c93b08
+Revises: 5d08e6a3c2f1
+Create Date: 2026-10-18 12:41:52.904376
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1f7c93b08'
+down_revision = '5d08e6a3c2f1'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+UPDATE "{table}" SET
+    upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND start_time >= :now),
+    past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND start_time < :now)
+"""
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    now = datetime.now()
+    op.execute(sa.text(BACKFILL.format(table='Venue', fk='venue_id')).bindparams(now=now))
+    op.execute(sa.text(BACKFILL.format(table='Artist', fk='artist_id')).bindparams(now=now))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -1,4 +1,20 @@
-from app import db
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from replicas import RoutingSQLAlchemy
+
+
+# bound to the app by create_app(), routes GET reads to the replicas if any
+db = RoutingSQLAlchemy()
+
+
+# A show occupies its venue from start_time for duration_minutes
+SHOW_DEFAULT_MINUTES = 120
+SHOW_MAX_MINUTES = 12 * 60
+
+
+# Postgres stores genres as a native array; SQLite (tests, local runs) as JSON
+Genres = ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
 
 
 # ----------------------------------------------------------------------------#
@@ -7,41 +23,84 @@ from app import db
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # the listing pages on (state, city, name, id), keyset cursors need them NOT NULL
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(Genres)
     website = db.Column(db.String(200))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
+    # maintained by counters.py, see there for how they are kept in sync
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='venue', lazy=True)
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(200))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='artist', lazy=True)
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=SHOW_DEFAULT_MINUTES,
+                                 server_default=str(SHOW_DEFAULT_MINUTES))
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
 
+
+# Two shows can't hold the same venue at once. The GiST index behind the
+# constraint also serves the availability queries in scheduling.py.
+SHOW_PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+event.listen(Show.__table__, 'after_create', DDL(
+    'CREATE EXTENSION IF NOT EXISTS btree_gist; '
+    'ALTER TABLE "Show" ADD CONSTRAINT show_venue_no_overlap '
+    'EXCLUDE USING gist (venue_id WITH =, {} WITH &&)'.format(SHOW_PERIOD)
+).execute_if(dialect='postgresql'))
+
+
+# Search matches this text with pg_trgm, see search.search_text(). The
+# migration creates the same indexes; this covers db.create_all().
+SEARCH_TEXT = "lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, ''))"
+
+for searchable, index_name in ((Venue, 'ix_venue_search_trgm'), (Artist, 'ix_artist_search_trgm')):
+    event.listen(searchable.__table__, 'after_create', DDL(
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm; '
+        'CREATE INDEX {} ON "{}" USING gin ({} gin_trgm_ops)'.format(
+            index_name, searchable.__tablename__, SEARCH_TEXT)
+    ).execute_if(dialect='postgresql'))
@@ -0,0 +1,76 @@
+import base64
+import binascii
+import json
+
+from sqlalchemy import tuple_
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    """Returns the key tuple stored in `cursor`, raising ValueError if it is malformed.
+
+    Each value must be a scalar of its column's type, anything else would
+    reach the driver. The key columns are NOT NULL, so None is rejected too.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (UnicodeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('invalid cursor')
+    for value, column in zip(values, columns):
+        if isinstance(value, bool) or not isinstance(value, column.type.python_type):
+            raise ValueError('invalid cursor')
+    return tuple(values)
+
+
+def keyset_page(query, columns, per_page, after=None, before=None):
+    """Fetch one page of `query` ordered by `columns`, starting after/before a cursor.
+
+    `columns` must end in a unique column (the primary key) so the ordering is total,
+    and be NOT NULL: a row value comparison never matches a NULL key.
+    Pages seek on the row value instead of using OFFSET, so page N costs the same
+    as page 1 when the ordering is backed by an index.
+    """
+    key = tuple_(*columns)
+    if before is not None:
+        rows = query.filter(key < tuple_(*decode_cursor(before, columns))) \
+            .order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+    else:
+        if after is not None:
+            query = query.filter(key > tuple_(*decode_cursor(after, columns)))
+        rows = query.order_by(*columns).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+
+    if not rows:
+        return Page(rows)
+
+    def cursor(row):
+        return encode_cursor(getattr(row, column.key) for column in columns)
+
+    # walking backwards we know there is a next page (we came from it); walking forwards,
+    # there is a previous page whenever we started from a cursor
+    if before is not None:
+        next_cursor = cursor(rows[-1])
+        prev_cursor = cursor(rows[0]) if has_more else None
+    else:
+        next_cursor = cursor(rows[-1]) if has_more else None
+        prev_cursor = cursor(rows[0]) if after is not None else None
+    return Page(rows, next_cursor, prev_cursor)
@@ -0,0 +1,99 @@
+import random
+import time
+
+from flask import current_app, g, request, session, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+#
+# Each URI in REPLICA_DATABASE_URIS becomes a "replica-N" bind. GET and
+# HEAD requests read from one replica, picked once per request; everything
+# else, CLI commands and any flush go to the primary. After a browser
+# session commits a write, its reads stay on the primary for
+# REPLICA_READ_YOUR_WRITES_SECONDS so replication lag can't hide the
+# write from the page it redirects to. For the same window after any
+# commit in this process, pages read from a replica are not put in the
+# page cache, where they would outlive the lag.
+# ----------------------------------------------------------------------------#
+
+READ_METHODS = ('GET', 'HEAD')
+LAST_WRITE = '_last_write'
+
+
+def replica_binds(app):
+    return sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or () if key.startswith('replica-'))
+
+
+def init_replicas(app):
+    """Register REPLICA_DATABASE_URIS as binds, call before db.init_app(app)."""
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for index, uri in enumerate(app.config['REPLICA_DATABASE_URIS']):
+        binds['replica-{}'.format(index)] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def wrote_recently():
+    last_write = session.get(LAST_WRITE)
+    return last_write is not None and \
+        time.time() - last_write < current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+
+
+def read_bind():
+    """The replica this request reads from, or None for the primary."""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return None
+    if 'replica_bind' not in g:
+        binds = replica_binds(current_app)
+        g.replica_bind = random.choice(binds) if binds and not wrote_recently() else None
+    return g.replica_bind
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        bind = None if self._flushing or self.info.get('wrote') else read_bind()
+        if bind is None:
+            return super().get_bind(mapper, clause)
+        return get_state(self.app).db.get_engine(self.app, bind=bind)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+        # on the sessionmaker, like cache.py and autocomplete.py (db.session): on
+        # SQLAlchemy 1.3 listeners there hide any on the RoutingSession class
+        event.listen(factory, 'after_flush', written)
+        event.listen(factory, 'after_commit', committed)
+        event.listen(factory, 'after_soft_rollback', rolled_back)
+        return factory
+
+
+# when this process last committed a write, see replica_may_lag()
+_last_commit = 0.0
+
+
+def written(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+def committed(db_session):
+    global _last_commit
+    if not db_session.info.pop('wrote', False):
+        return
+    _last_commit = time.time()
+    if has_request_context():
+        session[LAST_WRITE] = time.time()
+        # the rest of this request reads its own write too
+        g.pop('replica_bind', None)
+
+
+def rolled_back(db_session, previous_transaction):
+    db_session.info.pop('wrote', None)
+
+
+def replica_may_lag():
+    """True if this request read from a replica that may not have this process's last commit yet."""
+    return g.get('replica_bind') is not None and \
+        time.time() - _last_commit < current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
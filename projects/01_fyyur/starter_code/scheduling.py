@@ -0,0 +1,179 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, literal_column, and_, exists
+
+from models import db, Venue, Show, SHOW_DEFAULT_MINUTES, SHOW_MAX_MINUTES
+
+
+# ----------------------------------------------------------------------------#
+# Scheduling.
+#
+# On Postgres the show_venue_no_overlap exclusion constraint rejects
+# double bookings and its GiST index answers overlap queries. Elsewhere
+# conflicts are found through ix_show_venue_id_start_time: a show can
+# only overlap [start, end) if it starts in [start - SHOW_MAX_MINUTES, end).
+# ----------------------------------------------------------------------------#
+
+def show_end(start_time, duration_minutes):
+    return start_time + timedelta(minutes=duration_minutes or SHOW_DEFAULT_MINUTES)
+
+
+def show_period():
+    # must stay identical to models.SHOW_PERIOD for the GiST index to apply
+    return func.tsrange(Show.start_time,
+                        Show.start_time + Show.duration_minutes * literal_column("interval '1 minute'"))
+
+
+def overlaps(start_time, end_time):
+    """Criterion for shows occupying any part of [start_time, end_time)."""
+    if db.engine.dialect.name == 'postgresql':
+        return show_period().op('&&')(func.tsrange(start_time, end_time))
+    return and_(Show.start_time >= start_time - timedelta(minutes=SHOW_MAX_MINUTES),
+                Show.start_time < end_time)
+
+
+def find_conflicts(venue_id, start_time, duration_minutes):
+    """Shows already booked at `venue_id` that overlap the proposed one."""
+    end_time = show_end(start_time, duration_minutes)
+    candidates = Show.query.filter(Show.venue_id == venue_id).filter(overlaps(start_time, end_time)).all()
+    # the SQLite criterion is only a superset, settle it exactly here
+    return [show for show in candidates
+            if show.start_time < end_time and show_end(show.start_time, show.duration_minutes) > start_time]
+
+
+def overlapping_rows(rows):
+    """Indexes of rows in a batch that collide with another row of the same batch."""
+    by_venue = defaultdict(list)
+    for index, row in enumerate(rows):
+        by_venue[row['venue_id']].append(
+            (row['start_time'], show_end(row['start_time'], row.get('duration_minutes')), index))
+
+    colliding = set()
+    for periods in by_venue.values():
+        periods.sort()
+        latest_end, latest_index = None, None
+        for start_time, end_time, index in periods:
+            if latest_end is not None and start_time < latest_end:
+                colliding.update((index, latest_index))
+            if latest_end is None or end_time > latest_end:
+                latest_end, latest_index = end_time, index
+    return colliding
+
+
+def conflicting_rows(rows):
+    """Indexes of batch rows that overlap an existing show or another row."""
+    if not rows:
+        return set()
+
+    venue_ids = {row['venue_id'] for row in rows}
+    first = min(row['start_time'] for row in rows)
+    last = max(show_end(row['start_time'], row.get('duration_minutes')) for row in rows)
+    periods = defaultdict(list)
+    booked = db.session.query(Show.venue_id, Show.start_time, Show.duration_minutes) \
+        .filter(Show.venue_id.in_(venue_ids)).filter(overlaps(first, last))
+    for venue_id, start_time, duration_minutes in booked:
+        periods[venue_id].append((start_time, show_end(start_time, duration_minutes)))
+    schedules = {venue_id: IntervalIndex(venue_periods) for venue_id, venue_periods in periods.items()}
+
+    colliding = overlapping_rows(rows)
+    for index, row in enumerate(rows):
+        schedule = schedules.get(row['venue_id'])
+        end_time = show_end(row['start_time'], row.get('duration_minutes'))
+        if schedule is not None and schedule.overlaps(row['start_time'], end_time):
+            colliding.add(index)
+    return colliding
+
+
+# ----------------------------------------------------------------------------#
+# In-memory interval index (used when the database has no range types).
+# ----------------------------------------------------------------------------#
+
+class IntervalIndex:
+    """Static interval tree over one venue's shows, flattened into sorted arrays.
+
+    Intervals are sorted by start; max_ends[i] is the latest end among the
+    first i + 1 of them, so "does anything overlap [s, e)" is one bisect.
+    """
+
+    def __init__(self, periods):
+        periods = sorted(periods)
+        self.starts = [start for start, _ in periods]
+        self.max_ends = []
+        latest = None
+        for _, end in periods:
+            latest = end if latest is None or end > latest else latest
+            self.max_ends.append(latest)
+
+    def overlaps(self, start_time, end_time):
+        before_end = bisect_left(self.starts, end_time)
+        return before_end > 0 and self.max_ends[before_end - 1] > start_time
+
+
+_schedules = None
+_schedules_lock = threading.Lock()
+
+
+def venue_schedules():
+    global _schedules
+    ttl = current_app.config['SCHEDULES_TTL']
+    with _schedules_lock:
+        if _schedules is None or time.monotonic() - _schedules[0] > ttl:
+            periods = defaultdict(list)
+            rows = db.session.query(Show.venue_id, Show.start_time, Show.duration_minutes) \
+                .filter(Show.start_time.isnot(None))
+            for venue_id, start_time, duration_minutes in rows:
+                periods[venue_id].append((start_time, show_end(start_time, duration_minutes)))
+            _schedules = (time.monotonic(),
+                          {venue_id: IntervalIndex(venue_periods) for venue_id, venue_periods in periods.items()})
+        return _schedules[1]
+
+
+def clear_schedules():
+    global _schedules
+    with _schedules_lock:
+        _schedules = None
+
+
+def changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        session.info['stale_schedules'] = True
+
+
+def invalidate_committed(session):
+    if session.info.pop('stale_schedules', False):
+        clear_schedules()
+
+
+def forget_rolled_back(session, previous_transaction):
+    session.info.pop('stale_schedules', None)
+
+
+for change in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Show, change, changed)
+event.listen(db.session, 'after_commit', invalidate_committed)
+event.listen(db.session, 'after_soft_rollback', forget_rolled_back)
+
+
+def available_venues(start_time, end_time, page=1, per_page=50):
+    """Venues with no show overlapping [start_time, end_time), ordered by name.
+
+    Returns (total, venues on the requested page).
+    """
+    query = Venue.query
+    if db.engine.dialect.name == 'postgresql':
+        booked = exists().where(Show.venue_id == Venue.id).where(overlaps(start_time, end_time))
+        query = query.filter(~booked)
+    else:
+        busy = [venue_id for venue_id, schedule in venue_schedules().items()
+                if schedule.overlaps(start_time, end_time)]
+        if busy:
+            query = query.filter(~Venue.id.in_(busy))
+
+    query = query.order_by(Venue.name, Venue.id)
+    return query.count(), query.offset((page - 1) * per_page).limit(per_page).all()
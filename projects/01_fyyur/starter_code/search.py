@@ -0,0 +1,190 @@
+import re
+import threading
+import time
+from collections import defaultdict, Counter
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, literal, literal_column, or_, select, distinct
+
+from models import db, Venue, Artist
+
+
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
+
+# Share of the term's trigrams a fuzzy (non-substring) match must contain.
+# Mirrors pg_trgm's word_similarity_threshold default.
+FUZZY_THRESHOLD = 0.6
+
+
+def normalize(term):
+    # "San Francisco, CA" should match the "san francisco ca" search text
+    return ' '.join(re.split(r'[\s,]+', (term or '').lower())).strip()
+
+
+def search_text(model):
+    # must stay identical to models.SEARCH_TEXT, the expression the trigram indexes cover
+    space = literal_column("' '")
+    empty = literal_column("''")
+    return func.lower(
+        func.coalesce(model.name, empty) + space +
+        func.coalesce(model.city, empty) + space +
+        func.coalesce(model.state, empty)
+    )
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, term, page=1, per_page=20):
+    """Rank `model` rows by how well name, city and state match `term`.
+
+    Returns (total matches, rows on the requested page).
+    """
+    term = normalize(term)
+    if not term:
+        query = model.query.order_by(model.name, model.id)
+        return query.count(), query.offset((page - 1) * per_page).limit(per_page).all()
+
+    if db.engine.dialect.name == 'postgresql':
+        return search_trigram(model, term, page, per_page)
+    return search_inverted_index(model, term, page, per_page)
+
+
+def search_trigram(model, term, page, per_page):
+    text = search_text(model)
+    matches = or_(
+        text.like('%' + escape_like(term) + '%', escape='\\'),
+        literal(term).op('<%')(text)
+    )
+    rank = func.word_similarity(term, text) + func.similarity(func.lower(model.name), term)
+
+    total = db.session.query(func.count(model.id)).filter(matches).scalar()
+    rows = model.query.filter(matches).order_by(rank.desc(), model.name, model.id) \
+        .offset((page - 1) * per_page).limit(per_page).all()
+    return total, rows
+
+
+def search_inverted_index(model, term, page, per_page):
+    ranked = inverted_index(model).search(term)
+    ids = ranked[(page - 1) * per_page:page * per_page]
+    if not ids:
+        return len(ranked), []
+
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+    return len(ranked), [rows[id] for id in ids if id in rows]
+
+
+# ----------------------------------------------------------------------------#
+# Genre filter.
+# ----------------------------------------------------------------------------#
+
+def genre_filter(model, genres, match_all=False):
+    """Criterion for rows tagged with any (or all) of `genres`."""
+    genres = sorted(set(genres))
+    if db.engine.dialect.name == 'postgresql':
+        # && and @> are both served by the GIN index on the genres array
+        return model.genres.contains(genres) if match_all else model.genres.overlap(genres)
+
+    # SQLite keeps genres as a JSON array, unnest it with json_each
+    value = literal_column('value')
+    tagged = select([func.count(distinct(value))]).select_from(func.json_each(model.genres)) \
+        .where(value.in_(genres)).as_scalar()
+    return tagged == len(genres) if match_all else tagged > 0
+
+
+# ----------------------------------------------------------------------------#
+# Portable inverted index (used when the database has no pg_trgm).
+# ----------------------------------------------------------------------------#
+
+def trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self, documents):
+        self.built_at = time.monotonic()
+        self.documents = {}
+        self.postings = defaultdict(set)
+        for id, text in documents:
+            self.documents[id] = text
+            for gram in trigrams(text):
+                self.postings[gram].add(id)
+
+    def search(self, term):
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            for id in self.postings.get(gram, ()):
+                shared[id] += 1
+
+        scored = []
+        for id, count in shared.items():
+            text = self.documents[id]
+            score = count / len(grams)
+            if term in text:
+                score += 1
+            elif score < FUZZY_THRESHOLD:
+                continue
+            scored.append((-score, text, id))
+
+        scored.sort()
+        return [id for _, _, id in scored]
+
+
+# ----------------------------------------------------------------------------#
+# The inverted indexes are built on first use and dropped once a write to
+# their table commits in this process (not at flush, so a search in between
+# can't rebuild from the pre-commit rows). Writes by other processes and
+# `flask import` show up when an index expires after SEARCH_INDEX_TTL.
+# ----------------------------------------------------------------------------#
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def inverted_index(model):
+    ttl = current_app.config['SEARCH_INDEX_TTL']
+    with _indexes_lock:
+        index = _indexes.get(model)
+        if index is None or time.monotonic() - index.built_at > ttl:
+            rows = db.session.query(model.id, search_text(model)).all()
+            index = _indexes[model] = TrigramIndex(rows)
+        return index
+
+
+def clear_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('stale_search', set()).add(type(target))
+
+
+def invalidate_committed(session):
+    models = session.info.pop('stale_search', None)
+    if models:
+        with _indexes_lock:
+            for model in models:
+                _indexes.pop(model, None)
+
+
+def forget_rolled_back(session, previous_transaction):
+    session.info.pop('stale_search', None)
+
+
+for searchable in (Venue, Artist):
+    for change in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(searchable, change, changed)
+event.listen(db.session, 'after_commit', invalidate_committed)
+event.listen(db.session, 'after_soft_rollback', forget_rolled_back)
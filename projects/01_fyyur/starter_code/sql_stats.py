@@ -0,0 +1,106 @@
+import re
+import time
+from collections import Counter
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ----------------------------------------------------------------------------#
+# SQL statistics.
+#
+# Engine events count and time every statement a request issues. The same
+# statement shape running again and again within one request is how an
+# N+1 (a lazy load inside a template loop) shows up, so those are logged.
+# Routes declare a budget with @query_budget and going over it is logged,
+# or raised when QUERY_BUDGET_STRICT is set, which is how the test suite
+# catches regressions. With SQL_STATS_HEADERS the numbers are also sent
+# back as X-SQL-* response headers.
+# ----------------------------------------------------------------------------#
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes issued at least `threshold` times, most frequent first."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+
+def statement_shape(statement):
+    # expanded IN lists differ in length from one call to the next
+    shape = re.sub(r'\s+', ' ', statement).strip()
+    return re.sub(r'\((?:\s*(?:\?|%\(\w+\)s|%s)\s*,?)+\)', '(?)', shape)
+
+
+def query_budget(statements):
+    """Declare the most statements a view may issue per request."""
+    def decorator(view):
+        view.query_budget = statements
+        return view
+    return decorator
+
+
+def current_stats():
+    if has_request_context():
+        return g.get('sql_stats')
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('statement_started')
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def start_request():
+    g.sql_stats = QueryStats()
+
+
+def check_request(app, response):
+    stats = current_stats()
+    if stats is None:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else request.path
+    for shape, times in stats.repeated(app.config['N_PLUS_ONE_THRESHOLD']):
+        app.logger.warning('Possible N+1 on %s: %d x %s', route, times, shape)
+
+    if app.config['SQL_STATS_HEADERS']:
+        response.headers['X-SQL-Count'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = '{:.2f}'.format(stats.seconds * 1000)
+        response.headers['X-SQL-Repeated'] = str(len(stats.repeated(app.config['N_PLUS_ONE_THRESHOLD'])))
+
+    budget = getattr(app.view_functions.get(request.endpoint), 'query_budget', None)
+    if budget is not None and stats.count > budget:
+        message = '{} issued {} SQL statements, budget is {}'.format(route, stats.count, budget)
+        if app.config['QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        app.logger.warning(message)
+    return response
+
+
+def init_sql_stats(app):
+    # the engine listeners are process wide, every app created after the first shares them
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(start_request)
+    app.after_request(lambda response: check_request(app, response))
@@ -0,0 +1,664 @@
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from logging.handlers import QueueListener, RotatingFileHandler
+from sqlalchemy import event
+
+from app import create_app
+from counters import recount
+from cache import page_cache
+import autocomplete
+import importer
+import logs
+import scheduling
+import search
+from models import db, Venue, Artist, Show
+from sql_stats import QueryStats, QueryBudgetExceeded
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.database_name = "fyyur_test"
+        self.database_path = "postgresql://{}:{}@{}/{}".format('poufis', 'poufis123', 'localhost:5432',
+                                                               self.database_name)
+        self.config = {
+            'SQLALCHEMY_DATABASE_URI': self.database_path,
+            'TESTING': True,
+            'PAGE_CACHE_ENABLED': False,
+            'QUERY_BUDGET_STRICT': True,
+            'SQL_STATS_HEADERS': True
+        }
+        self.app = create_app(self.config)
+        page_cache.clear()
+        autocomplete.names.clear()
+        search.clear_indexes()
+        scheduling.clear_schedules()
+        self.client = self.app.test_client
+        self.shows_added = 0
+
+        # binds the app to the current context
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        Show.query.delete()
+        Venue.query.delete()
+        Artist.query.delete()
+        db.session.commit()
+        self.app_context.pop()
+
+    def add_venues(self, areas):
+        for i in range(areas):
+            db.session.add(Venue(name='Venue {}'.format(i), city='City {}'.format(i), state='CA'))
+            db.session.add(Venue(name='Other Venue {}'.format(i), city='City {}'.format(i), state='CA'))
+        db.session.commit()
+
+    def add_shows(self, venue, artist, count):
+        # alternate past and upcoming shows, a day apart so none double books the venue
+        now = datetime.now()
+        for i in range(self.shows_added, self.shows_added + count):
+            start_time = now + timedelta(days=i + 1) if i % 2 else now - timedelta(days=i + 1)
+            db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time))
+        self.shows_added += count
+        db.session.commit()
+
+    def count_statements(self, path):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = self.client().get(path)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(res.status_code, 200)
+        return len(statements)
+
+    def test_venues_grouped_by_area(self):
+        self.add_venues(3)
+
+        res = self.client().get('/venues')
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertLess(body.index('City 0, CA'), body.index('City 1, CA'))
+        self.assertLess(body.index('City 1, CA'), body.index('City 2, CA'))
+        self.assertEqual(body.count('City 0, CA'), 1)
+
+    def test_venues_query_count_is_constant(self):
+        self.add_venues(2)
+        few_areas = self.count_statements('/venues')
+
+        self.add_venues(50)
+        many_areas = self.count_statements('/venues')
+
+        self.assertEqual(few_areas, many_areas)
+
+    def test_detail_pages_query_count_is_constant(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+        other_artist = Artist(name='Matt Quevedo', city='New York', state='NY', genres=['Jazz'])
+        db.session.add_all([venue, artist, other_artist])
+        db.session.commit()
+
+        self.add_shows(venue, artist, 2)
+        venue_few = self.count_statements('/venues/{}'.format(venue.id))
+        artist_few = self.count_statements('/artists/{}'.format(artist.id))
+
+        self.add_shows(venue, artist, 30)
+        self.add_shows(venue, other_artist, 30)
+        venue_many = self.count_statements('/venues/{}'.format(venue.id))
+        artist_many = self.count_statements('/artists/{}'.format(artist.id))
+
+        self.assertEqual(venue_few, venue_many)
+        self.assertEqual(artist_few, artist_many)
+
+    def test_shows_paginated_and_filtered(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        self.add_shows(venue, artist, 10)
+
+        res = self.client().get('/shows?limit=3')
+        body = res.data.decode()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(body.count('tile-show'), 3)
+        self.assertIn('page=2', body)
+
+        res = self.client().get('/shows?limit=50&from=' + datetime.now().isoformat())
+        body = res.data.decode()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(body.count('tile-show'), 5)
+        self.assertIn('Guns N Petals', body)
+        self.assertNotIn('page=2', body)
+
+        res = self.client().get('/shows?from=99999999999999999999')
+        self.assertEqual(res.status_code, 200)
+
+    def test_search_matches_name_and_city_ranked(self):
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA'),
+            Venue(name='Hop Shop', city='San Francisco', state='CA'),
+            Venue(name='The Dueling Pianos Bar', city='New York', state='NY')
+        ])
+        db.session.commit()
+
+        res = self.client().post('/venues/search', data={'search_term': 'hop shop'})
+        body = res.data.decode()
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Hop Shop', body)
+        self.assertNotIn('Dueling Pianos', body)
+
+        res = self.client().post('/venues/search', data={'search_term': 'Hop'})
+        body = res.data.decode()
+        self.assertIn(': 2</h3>', body)
+        self.assertLess(body.index('Hop Shop'), body.index('The Musical Hop'))
+
+        res = self.client().post('/venues/search', data={'search_term': 'new york, ny'})
+        body = res.data.decode()
+        self.assertIn(': 1</h3>', body)
+        self.assertIn('The Dueling Pianos Bar', body)
+
+    def test_search_index_refreshed_on_commit_and_expiry(self):
+        db.session.add(Venue(name='Hop Shop', city='San Francisco', state='CA'))
+        db.session.commit()
+        self.assertEqual(search.search(Venue, 'hop')[0], 1)
+
+        # flushed but not committed: the index isn't rebuilt from these rows
+        db.session.add(Venue(name='Hop House', city='San Francisco', state='CA'))
+        db.session.flush()
+        self.assertEqual(search.search(Venue, 'hop')[0], 1)
+        db.session.commit()
+        self.assertEqual(search.search(Venue, 'hop')[0], 2)
+
+        # a write the ORM never saw, like another process's, waits for the TTL
+        db.session.execute(Venue.__table__.insert(), {'name': 'Hop Hall', 'city': 'Austin', 'state': 'TX'})
+        db.session.commit()
+        self.assertEqual(search.search(Venue, 'hop')[0], 2)
+        self.addCleanup(self.app.config.__setitem__, 'SEARCH_INDEX_TTL', self.app.config['SEARCH_INDEX_TTL'])
+        self.app.config['SEARCH_INDEX_TTL'] = -1
+        self.assertEqual(search.search(Venue, 'hop')[0], 3)
+
+    def test_artists_keyset_pagination(self):
+        self.addCleanup(self.app.config.__setitem__, 'ARTISTS_PER_PAGE', self.app.config['ARTISTS_PER_PAGE'])
+        self.app.config['ARTISTS_PER_PAGE'] = 2
+        for name in ['Delta', 'Alpha', 'Echo', 'Charlie', 'Bravo']:
+            db.session.add(Artist(name=name, city='San Francisco', state='CA'))
+        db.session.commit()
+
+        first = self.client().get('/artists').data.decode()
+        self.assertIn('Alpha', first)
+        self.assertIn('Bravo', first)
+        self.assertNotIn('Charlie', first)
+
+        next_url = first.split('class="next"><a href="')[1].split('"')[0].replace('&amp;', '&')
+        second = self.client().get(next_url).data.decode()
+        self.assertIn('Charlie', second)
+        self.assertIn('Delta', second)
+        self.assertNotIn('Bravo', second)
+
+        prev_url = second.split('class="previous"><a href="')[1].split('"')[0].replace('&amp;', '&')
+        back = self.client().get(prev_url).data.decode()
+        self.assertIn('Alpha', back)
+        self.assertIn('Bravo', back)
+        self.assertNotIn('class="previous"', back)
+
+        res = self.client().get('/artists?after=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+        # well-formed JSON, but an object where the name belongs
+        res = self.client().get('/artists?after=W3siYSI6MX0sIDFd')
+        self.assertEqual(res.status_code, 400)
+
+    def test_show_counters_follow_writes_and_rollover(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        venue_id, artist_id = venue.id, artist.id
+
+        soon = datetime.now() + timedelta(hours=1)
+        res = self.client().post('/shows/create', data={
+            'artist_id': artist_id, 'venue_id': venue_id, 'start_time': soon.strftime('%Y-%m-%d %H:%M:%S')})
+        self.assertEqual(res.status_code, 302)
+        self.add_shows(Venue.query.get(venue_id), Artist.query.get(artist_id), 4)
+
+        venue = Venue.query.get(venue_id)
+        self.assertEqual(venue.upcoming_shows_count, 3)
+        self.assertEqual(venue.past_shows_count, 2)
+
+        recount(soon + timedelta(minutes=1), since=soon - timedelta(hours=1))
+        artist = Artist.query.get(artist_id)
+        self.assertEqual(artist.upcoming_shows_count, 2)
+        self.assertEqual(artist.past_shows_count, 3)
+
+        db.session.delete(Show.query.filter(Show.artist_id == artist_id).first())
+        db.session.commit()
+        Artist.query.filter(Artist.id == artist_id).update({'upcoming_shows_count': 99})
+        db.session.commit()
+        recount(datetime.now())
+        artist = Artist.query.get(artist_id)
+        self.assertEqual(artist.upcoming_shows_count + artist.past_shows_count, 4)
+        self.assertNotEqual(artist.upcoming_shows_count, 99)
+
+    def test_page_cache_invalidated_by_writes(self):
+        self.app.config['PAGE_CACHE_ENABLED'] = True
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        venue_path = '/venues/{}'.format(venue.id)
+
+        self.assertEqual(self.client().get(venue_path).headers['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client().get(venue_path).headers['X-Page-Cache'], 'hit')
+        self.assertEqual(self.count_statements(venue_path), 0)
+
+        self.add_shows(venue, artist, 1)
+        res = self.client().get(venue_path)
+        self.assertEqual(res.headers['X-Page-Cache'], 'miss')
+        self.assertIn('Guns N Petals', res.data.decode())
+
+        self.client().get('/venues')
+        db.session.add(Venue(name='Hop Shop', city='San Francisco', state='CA'))
+        db.session.commit()
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-Page-Cache'], 'miss')
+        self.assertIn('Hop Shop', res.data.decode())
+        self.assertEqual(self.client().get(venue_path).headers['X-Page-Cache'], 'hit')
+
+        artist_path = '/artists/{}'.format(artist.id)
+        self.client().get(artist_path)
+        self.assertEqual(self.client().get(artist_path).headers['X-Page-Cache'], 'hit')
+        Venue.query.get(venue.id).name = 'The Musical Hop Annex'
+        db.session.commit()
+        res = self.client().get(artist_path)
+        self.assertEqual(res.headers['X-Page-Cache'], 'miss')
+        self.assertIn('The Musical Hop Annex', res.data.decode())
+
+    def test_listings_filtered_by_genre(self):
+        db.session.add_all([
+            Artist(name='Jazz Only', city='San Francisco', state='CA', genres=['Jazz']),
+            Artist(name='Folk Only', city='San Francisco', state='CA', genres=['Folk']),
+            Artist(name='Jazz And Folk', city='San Francisco', state='CA', genres=['Folk', 'Jazz']),
+            Venue(name='Rock Venue', city='San Francisco', state='CA', genres=['Rock n Roll'])
+        ])
+        db.session.commit()
+
+        body = self.client().get('/artists?genre=Jazz&genre=Folk').data.decode()
+        self.assertIn('Jazz Only', body)
+        self.assertIn('Folk Only', body)
+        self.assertIn('Jazz And Folk', body)
+
+        body = self.client().get('/artists?genre=Jazz&genre=Folk&match=all').data.decode()
+        self.assertNotIn('Jazz Only', body)
+        self.assertNotIn('Folk Only', body)
+        self.assertIn('Jazz And Folk', body)
+
+        body = self.client().get('/venues?genre=Jazz').data.decode()
+        self.assertNotIn('Rock Venue', body)
+
+    def test_bulk_import_validates_and_inserts(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        db.session.add(venue)
+        db.session.commit()
+
+        artists = io.StringIO(
+            'name,city,state,phone,genres,image_link,facebook_link\n'
+            'Guns N Petals,San Francisco,CA,326-123-5000,Rock n Roll;Jazz,,https://www.facebook.com/GunsNPetals\n'
+            'No State,San Francisco,,326-123-5000,Jazz,,https://www.facebook.com/NoState\n'
+            'Matt Quevedo,New York,NY,300-400-5000,Jazz,,https://www.facebook.com/mattquevedo\n'
+        )
+        result = importer.import_rows('artists', importer.read_rows(artists, 'csv'), batch_size=2)
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual([number for number, _ in result.rejected], [3])
+        self.assertEqual(Artist.query.filter_by(name='Guns N Petals').one().genres, ['Rock n Roll', 'Jazz'])
+
+        artist_id = Artist.query.filter_by(name='Matt Quevedo').one().id
+        shows = io.StringIO('\n'.join(json.dumps(show) for show in [
+            {'artist_id': artist_id, 'venue_id': venue.id, 'start_time': '2035-04-01 20:00:00'},
+            {'artist_id': artist_id, 'venue_id': 50000, 'start_time': '2035-04-01 20:00:00'},
+            {'artist_id': artist_id, 'venue_id': venue.id, 'start_time': 'tomorrow'},
+        ]))
+        result = importer.import_rows('shows', importer.read_rows(shows, 'ndjson'))
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(sorted(number for number, _ in result.rejected), [2, 3])
+        self.assertEqual(Show.query.filter_by(artist_id=artist_id).count(), 1)
+
+    def test_batch_show_creation(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        artist_id, venue_id = artist.id, venue.id
+        tour = [{'artist_id': artist_id, 'venue_id': venue_id, 'start_time': '2035-04-0{} 20:00:00'.format(day)}
+                for day in range(1, 6)]
+
+        res = self.client().post('/shows/batch', json={'shows': tour + [
+            {'artist_id': artist_id, 'venue_id': 50000, 'start_time': '2035-04-06 20:00:00'}]})
+        data = res.get_json()
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+        self.assertIn('errors', data['results'][5])
+        self.assertNotIn('errors', data['results'][0])
+        self.assertEqual(Show.query.count(), 0)
+
+        res = self.client().post('/shows/batch', json=tour)
+        self.assertEqual(res.status_code, 400)
+
+        updates = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE'):
+                updates.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = self.client().post('/shows/batch', json={'shows': tour})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        data = res.get_json()
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(data['created'], 5)
+        self.assertTrue(all(result['id'] for result in data['results']))
+        self.assertEqual(Show.query.filter_by(artist_id=artist_id).count(), 5)
+        # one counter UPDATE for the venue and one for the artist, not two per show
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(Venue.query.get(venue_id).upcoming_shows_count, 5)
+        self.assertEqual(Artist.query.get(artist_id).upcoming_shows_count, 5)
+
+        db.session.delete(Show.query.filter_by(artist_id=artist_id).first())
+        db.session.commit()
+        self.assertEqual(Venue.query.get(venue_id).upcoming_shows_count, 4)
+
+    def test_double_booking_rejected_and_availability(self):
+        hop = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        piano = Venue(name='The Dueling Pianos Bar', city='New York', state='NY')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([hop, piano, artist])
+        db.session.commit()
+        hop_id, piano_id, artist_id = hop.id, piano.id, artist.id
+
+        res = self.client().post('/shows/batch', json={'shows': [
+            {'artist_id': artist_id, 'venue_id': hop_id, 'start_time': '2035-06-01 20:00:00',
+             'duration_minutes': 180}]})
+        self.assertEqual(res.status_code, 201)
+
+        res = self.client().post('/shows/batch', json={'shows': [
+            {'artist_id': artist_id, 'venue_id': hop_id, 'start_time': '2035-06-01 22:00:00'},
+            {'artist_id': artist_id, 'venue_id': piano_id, 'start_time': '2035-06-01 22:00:00'},
+            {'artist_id': artist_id, 'venue_id': piano_id, 'start_time': '2035-06-01 23:00:00'}]})
+        results = res.get_json()['results']
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual([bool(result.get('errors')) for result in results], [True, True, True])
+
+        self.client().post('/shows/create', data={
+            'artist_id': artist_id, 'venue_id': hop_id, 'start_time': '2035-06-01 21:00:00'})
+        self.assertEqual(Show.query.filter_by(venue_id=hop_id).count(), 1)
+
+        res = self.client().get('/venues/availability?start=2035-06-01T21:00:00&end=2035-06-01T23:00:00')
+        data = res.get_json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([venue['id'] for venue in data['venues']], [piano_id])
+
+        res = self.client().get('/venues/availability?start=2035-06-01T23:00:00&end=2035-06-02T01:00:00')
+        self.assertEqual(res.get_json()['total_venues'], 2)
+
+        res = self.client().get('/venues/availability?start=2035-06-01T23:00:00&end=2035-06-03T00:00Z')
+        self.assertEqual(res.status_code, 200)
+
+        shows = io.StringIO(
+            'artist_id,venue_id,start_time,duration_minutes\n'
+            '{0},{1},2035-07-01 20:00:00,\n'
+            '{0},{1},2035-06-01 22:00:00,60\n'
+            '{0},{2},2035-07-01 20:00:00,90\n'
+            '{0},{2},2035-07-01 21:00:00,60\n'.format(artist_id, hop_id, piano_id))
+        result = importer.import_rows('shows', importer.read_rows(shows, 'csv'))
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(sorted(number for number, _ in result.rejected), [3, 4, 5])
+        self.assertEqual(Show.query.filter_by(venue_id=hop_id, start_time=datetime(2035, 7, 1, 20))
+                         .one().duration_minutes, 120)
+
+    def test_venue_schedules_refreshed_on_commit_and_expiry(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        venue_id, artist_id = venue.id, artist.id
+        start, end = datetime(2035, 6, 1, 20), datetime(2035, 6, 1, 22)
+        self.assertEqual(scheduling.available_venues(start, end)[0], 1)
+
+        # flushed but not committed: the schedules aren't rebuilt from this show
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start))
+        db.session.flush()
+        self.assertEqual(scheduling.available_venues(start, end)[0], 1)
+        db.session.commit()
+        self.assertEqual(scheduling.available_venues(start, end)[0], 0)
+
+        # a booking the ORM never saw, like another process's, waits for the TTL
+        later = datetime(2035, 7, 1, 20)
+        db.session.execute(Show.__table__.insert(),
+                           {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': later})
+        db.session.commit()
+        self.assertEqual(scheduling.available_venues(later, later + timedelta(hours=1))[0], 1)
+        self.addCleanup(self.app.config.__setitem__, 'SCHEDULES_TTL', self.app.config['SCHEDULES_TTL'])
+        self.app.config['SCHEDULES_TTL'] = -1
+        self.assertEqual(scheduling.available_venues(later, later + timedelta(hours=1))[0], 0)
+
+    def test_calendar_counts_per_day(self):
+        hop = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+        piano = Venue(name='The Dueling Pianos Bar', city='New York', state='NY')
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([hop, piano, artist])
+        db.session.commit()
+        for venue, hour in [(hop, 12), (hop, 20), (piano, 20)]:
+            db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime(2035, 6, 1, hour)))
+        db.session.add(Show(venue_id=hop.id, artist_id=artist.id, start_time=datetime(2035, 6, 3, 20)))
+        db.session.commit()
+
+        res = self.client().get('/calendar?start=2035-06-01&end=2035-06-05&format=json')
+        data = res.get_json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([(day['day'], day['count']) for day in data['days']], [('2035-06-01', 3), ('2035-06-03', 1)])
+
+        res = self.client().get('/calendar?start=2035-06-01&end=2035-06-02&group=city&format=json')
+        days = res.get_json()['days']
+        self.assertEqual([(day['city'], day['count']) for day in days], [('New York', 1), ('San Francisco', 2)])
+
+        res = self.client().get('/calendar?start=2035-06-01&end=2035-06-02&group=venue')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('The Dueling Pianos Bar', res.data.decode())
+
+        # a naive start and an aware end are compared in server local time
+        res = self.client().get('/calendar?start=2035-06-01&end=2035-06-05T00:00Z&format=json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['total_shows'], 4)
+
+    def test_export_streams_shows_with_names(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz', 'Folk'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        self.add_shows(venue, artist, 3)
+
+        statements = self.count_statements('/export/shows?format=ndjson')
+        res = self.client().get('/export/shows?format=ndjson')
+        rows = [json.loads(line) for line in res.data.decode().splitlines()]
+        self.assertEqual(statements, 1)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({(row['venue_name'], row['artist_name']) for row in rows},
+                         {('The Musical Hop', 'Guns N Petals')})
+
+        res = self.client().get('/export/venues')
+        lines = res.data.decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,name,city'))
+        self.assertIn('Jazz;Folk', lines[1])
+
+        res = self.client().get('/export/payments')
+        self.assertEqual(res.status_code, 404)
+
+    def test_requests_logged_with_route_status_and_sql_count(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        venue_id = venue.id
+
+        with self.assertLogs('fyyur.requests') as logs:
+            self.client().get('/venues/{}'.format(venue_id))
+            self.client().get('/venues/1000')
+
+        found, missing = [record.request for record in logs.records]
+        self.assertEqual(found['route'], '/venues/<int:venue_id>')
+        self.assertEqual(found['status'], 200)
+        self.assertGreater(found['sql_count'], 0)
+        self.assertEqual(missing['status'], 404)
+
+    def test_forked_worker_logs_to_its_own_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        def worker_listener():
+            handler = RotatingFileHandler(os.path.join(directory, 'error.log'), maxBytes=1024, backupCount=1)
+            self.addCleanup(handler.close)
+            listener = QueueListener(queue.Queue(), handler)
+            # what the after_in_child hook runs in a preloaded worker
+            logs.reopen_in_worker(listener)
+            self.addCleanup(listener.slot_lock.close)
+            return listener
+
+        first = worker_listener()
+        first.queue.put(logging.makeLogRecord({'msg': 'from the worker'}))
+        first.stop()
+        with open(os.path.join(directory, 'error.0.log')) as worker_log:
+            self.assertIn('from the worker', worker_log.read())
+        with open(os.path.join(directory, 'error.log')) as parent_log:
+            self.assertEqual(parent_log.read(), '')
+
+        # a second live worker gets the next slot, a replacement reuses a freed one
+        second = worker_listener()
+        second.stop()
+        self.assertEqual(second.slot, 1)
+        first.slot_lock.close()
+        replacement = worker_listener()
+        replacement.stop()
+        self.assertEqual(replacement.slot, 0)
+
+    def test_query_budget_enforced_and_reported(self):
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        path = '/venues/{}'.format(venue.id)
+
+        res = self.client().get(path)
+        self.assertEqual(res.headers['X-SQL-Count'], '1')
+        self.assertEqual(res.headers['X-SQL-Repeated'], '0')
+
+        view = self.app.view_functions['show_venue']
+        budget, view.query_budget = view.query_budget, 0
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client().get(path)
+        finally:
+            view.query_budget = budget
+
+    def test_repeated_statement_shapes_flagged(self):
+        stats = QueryStats()
+        for ids in ('?', '?, ?', '?, ?, ?'):
+            stats.record('SELECT * FROM "Show" WHERE "Show".venue_id IN ({})'.format(ids), 0.001)
+        stats.record('SELECT * FROM "Venue"', 0.001)
+
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.repeated(3), [('SELECT * FROM "Show" WHERE "Show".venue_id IN (?)', 3)])
+
+    def test_get_requests_read_from_replica_until_a_write(self):
+        replica_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, replica_dir)
+        replica_path = 'sqlite:///' + os.path.join(replica_dir, 'replica.db')
+        app = create_app(dict(self.config, REPLICA_DATABASE_URIS=[replica_path], PAGE_CACHE_ENABLED=True))
+
+        with app.app_context():
+            replica = db.get_engine(app, bind='replica-0')
+            self.addCleanup(replica.dispose)
+            db.Model.metadata.create_all(replica)
+            with replica.begin() as connection:
+                connection.execute(Venue.__table__.insert(), {'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'})
+
+        client = app.test_client()
+        self.assertIn('Replica Hall', client.get('/venues').data.decode())
+
+        res = client.post('/venues/create', data={
+            'name': 'The Musical Hop',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'genres': ['Jazz'],
+            'facebook_link': 'https://www.facebook.com/TheMusicalHop'
+        })
+        self.assertEqual(res.status_code, 302)
+
+        # other sessions still read the replica, which may lag: not cached
+        other = app.test_client()
+        self.assertIn('Replica Hall', other.get('/venues').data.decode())
+        self.assertEqual(other.get('/venues').headers['X-Page-Cache'], 'miss')
+
+        # read-your-writes: this browser session now reads from the primary
+        body = client.get('/venues').data.decode()
+        self.assertIn('The Musical Hop', body)
+        self.assertNotIn('Replica Hall', body)
+
+    def test_autocomplete_served_from_memory_and_kept_current(self):
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA'),
+            Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA'),
+            Artist(name='The Wild Sax Band', city='San Francisco', state='CA')
+        ])
+        db.session.commit()
+
+        res = self.client().get('/autocomplete?q=mus')
+        self.assertEqual({result['name'] for result in res.get_json()['results']},
+                         {'The Musical Hop', 'Park Square Live Music & Coffee'})
+        self.assertEqual(self.count_statements('/autocomplete?q=the'), 0)
+
+        venue = Venue.query.filter_by(name='The Musical Hop').one()
+        venue.name = 'The Dueling Pianos Bar'
+        db.session.add(Artist(name='Matt Quevedo', city='New York', state='NY'))
+        db.session.commit()
+
+        res = self.client().get('/autocomplete?q=the&kind=venues')
+        self.assertEqual([result['name'] for result in res.get_json()['results']], ['The Dueling Pianos Bar'])
+        res = self.client().get('/autocomplete?q=Que&kind=artists')
+        self.assertEqual([result['name'] for result in res.get_json()['results']], ['Matt Quevedo'])
+        self.assertEqual(self.client().get('/autocomplete?q=x&kind=shows').status_code, 400)
+
+    def test_datetime_filter_memo_sized_from_app_config(self):
+        app = create_app(dict(self.config, DATETIME_FILTER_CACHE_SIZE=2))
+        format_datetime = app.jinja_env.filters['datetime']
+        self.assertEqual(format_datetime.cache_info().maxsize, 2)
+        self.assertEqual(format_datetime(datetime(2035, 6, 1, 20), 'full'), 'Friday June, 1, 2035 at 8:00PM')
+        self.assertEqual(self.app.jinja_env.filters['datetime'].cache_info().currsize, 0)
+
+    def test_404_if_venue_does_not_exist(self):
+        res = self.client().get('/venues/50000')
+
+        self.assertEqual(res.status_code, 404)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -2,26 +2,80 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from flask_migrate import Migrate
+from sqlalchemy import func
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, category_cache
+from quiz_sessions import QuizSessionStore
 
 
-def paginate_books(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
+QUESTIONS_PER_PAGE = 10
 
-    books = [book.format() for book in selection]
-    current_books = books[start:end]
 
-    return current_books
+def paginate_questions(request, query):
+    """One page of `query` as formatted questions, paged in SQL by id.
+
+    ?cursor=<last id seen> continues after that question with a keyset
+    filter, which stays as cheap on deep pages as on the first one.
+    ?page=N is kept for the frontend and maps to LIMIT/OFFSET.
+    """
+    cursor = request.args.get('cursor', type=int)
+    query = query.order_by(Question.id)
+    if cursor is not None:
+        query = query.filter(Question.id > cursor)
+    else:
+        page = request.args.get('page', 1, type=int)
+        query = query.offset((max(page, 1) - 1) * QUESTIONS_PER_PAGE)
+
+    questions = query.limit(QUESTIONS_PER_PAGE).all()
+    next_cursor = questions[-1].id if len(questions) == QUESTIONS_PER_PAGE else None
+    return [question.format() for question in questions], next_cursor
+
+
+QUIZ_SAMPLE_ATTEMPTS = 5
+
+
+def random_question(category_id, previous):
+    """One random question from the category (0 for all) whose id is not in `previous`.
+
+    Every question is equally likely: a random OFFSET below the category's
+    count, walked on the (category, id) index, picks one question. Picks
+    that were already asked are redrawn; when they keep missing (most of
+    the category has been played) it falls back to a random OFFSET over
+    the remaining count. Neither path loads more than one question.
+    """
+    query = Question.query
+    if category_id != 0:
+        query = query.filter(Question.category == category_id)
+
+    total = query.count()
+    if total == 0:
+        return None
+    for _ in range(QUIZ_SAMPLE_ATTEMPTS):
+        question = query.order_by(Question.id).offset(random.randrange(total)).first()
+        if question is not None and question.id not in previous:
+            return question
+
+    remaining = query.filter(~Question.id.in_(list(previous))) if previous else query
+    count = remaining.count()
+    if count == 0:
+        return None
+    return remaining.order_by(Question.id).offset(random.randrange(count)).first()
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    # seconds between checks for category changes made by other processes, None to never check
+    app.config['CATEGORY_CACHE_TTL'] = None
+    # seconds an idle quiz session is kept
+    app.config['QUIZ_SESSION_TTL'] = 3600
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
+    Migrate(app, db)
+    quiz_sessions = QuizSessionStore(app.config['QUIZ_SESSION_TTL'])
     CORS(app, resources={"*": {"origins": "*"}})
 
     # CORS Headers
@@ -33,44 +87,27 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def get_categories():
-        categories = Category.query.all()
-        categories_formatted = [category.format() for category in categories]
-
-        all_categories = {}
-        for c in categories_formatted:
-            all_categories[c['id']] = c['type']
-
-        return jsonify({
-            'success': True,
-            'categories': all_categories
-        })
-
-    QUESTIONS_PER_PAGE = 10
+        # served as serialized when the cache was loaded
+        categories, body, etag = category_cache.load(app.config['CATEGORY_CACHE_TTL'])
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response.make_conditional(request)
 
     @app.route('/questions')
     def get_questions():
 
-        page = request.args.get('page', 1, type=int)
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
-        selection = Question.query.all()
-        questions = [q.format() for q in selection]
-        current_questions = questions[start:end]
-
-        categories = Category.query.all()
-        categories_formatted = [category.format() for category in categories]
-
-        all_categories = {}
-        for c in categories_formatted:
-            all_categories[c['id']] = c['type']
+        current_questions, next_cursor = paginate_questions(request, Question.query)
 
         if len(current_questions) == 0:
             abort(404)
 
+        all_categories = category_cache.load(app.config['CATEGORY_CACHE_TTL'])[0]
+
         return jsonify({
             'success': True,
             'questions': current_questions,
-            'total_questions': len(selection),
+            'total_questions': db.session.query(func.count(Question.id)).scalar(),
+            'next_cursor': next_cursor,
             'current_category': None,
             'categories': all_categories
         })
@@ -105,6 +142,8 @@ def create_app(test_config=None):
         new_category = body.get('category', None)
 
         try:
+            if new_category is not None:
+                new_category = int(new_category)
             question = Question(question=new_question, answer=new_answer, difficulty=new_difficulty,
                                 category=new_category)
             question.insert()
@@ -139,7 +178,7 @@ def create_app(test_config=None):
     @app.route('/categories/<int:category_id>/questions')
     def get_category_questions(category_id):
 
-        questions = Question.query.filter(Question.category == str(category_id)).all()
+        questions = Question.query.filter(Question.category == category_id).all()
         result_questions = [q.format() for q in questions]
 
         return jsonify({
@@ -154,24 +193,11 @@ def create_app(test_config=None):
         category = body.get('quiz_category')
         previous_questions = body.get('previous_questions')
         category_id = category['id']
-        if category_id != 0:
-            questions = Question.query.filter(Question.category == category_id).filter(
-                ~Question.id.in_(previous_questions)).all()
-        else:
-            questions = Question.query.filter(~Question.id.in_(previous_questions)).all()
-
-        result_questions = [q.format() for q in questions]
 
-        try:
-            question = random.choice(result_questions)
-            return jsonify({
-                'question': question
-            })
-
-        except IndexError:
-            return jsonify({
-                'question': None
-            })
+        question = random_question(category_id, set(previous_questions))
+        return jsonify({
+            'question': question.format() if question is not None else None
+        })
 
     '''  
     TEST: In the "Play" tab, after a user selects "All" or a category,
@@ -179,6 +205,43 @@ def create_app(test_config=None):
     and shown whether they were correct or not. 
     '''
 
+    '''
+    Quiz sessions: the server remembers which questions were asked, so a
+    round only sends the token instead of the growing previous_questions.
+    '''
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz():
+        body = request.get_json(silent=True) or {}
+        category = body.get('quiz_category') or {}
+        # the frontend sends the ids it got from Object.keys(), as strings
+        try:
+            category_id = int(category.get('id', 0))
+        except (TypeError, ValueError):
+            abort(400)
+
+        token = quiz_sessions.start(category_id)
+        return jsonify({
+            'success': True,
+            'token': token,
+            'expires_in': app.config['QUIZ_SESSION_TTL']
+        })
+
+    @app.route('/quizzes/sessions/<token>/next', methods=['POST'])
+    def next_quiz_question(token):
+        session = quiz_sessions.get(token)
+        if session is None:
+            abort(404)
+
+        question = random_question(session.category_id, session.seen)
+        if question is not None:
+            session.seen.add(question.id)
+        return jsonify({
+            'success': True,
+            'question': question.format() if question is not None else None,
+            'asked': len(session.seen)
+        })
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({
@@ -0,0 +1,42 @@
+"""integer foreign key and index for questions.category
+
+Revision ID: 4e7b2c9a1d36
+Revises:
+Create Date: 2026-10-18 15:42:11.508734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b2c9a1d36'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # tables made by an older db.create_all() have a varchar column, trivia.psql
+    # an integer one with a constraint named "category"; both end up the same
+    op.execute('ALTER TABLE questions DROP CONSTRAINT IF EXISTS category')
+    op.alter_column('questions', 'category', existing_type=sa.String(), type_=sa.Integer(),
+                    postgresql_using="NULLIF(trim(category::text), '')::integer")
+    op.execute('UPDATE questions SET category = NULL '
+               'WHERE category NOT IN (SELECT id FROM categories)')
+
+    # setup_db() runs db.create_all() before the upgrade, on a fresh
+    # database that has already made the key and the index
+    inspector = sa.inspect(op.get_bind())
+    if 'questions_category_fkey' not in {key['name'] for key in inspector.get_foreign_keys('questions')}:
+        op.create_foreign_key('questions_category_fkey', 'questions', 'categories', ['category'], ['id'],
+                              onupdate='CASCADE', ondelete='SET NULL')
+    if 'ix_questions_category_id' not in {index['name'] for index in inspector.get_indexes('questions')}:
+        op.create_index('ix_questions_category_id', 'questions', ['category', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_questions_category_id', table_name='questions')
+    op.drop_constraint('questions_category_fkey', 'questions', type_='foreignkey')
+    op.alter_column('questions', 'category', existing_type=sa.Integer(), type_=sa.String(),
+                    postgresql_using='category::varchar')
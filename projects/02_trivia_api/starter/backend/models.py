@@ -1,5 +1,8 @@
+import hashlib
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import threading
+import time
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -24,17 +27,19 @@ def setup_db(app, database_path=database_path):
 
 '''
 Question
-
+    category lookups go through the (category, id) index, in id order for
+    paging and for the random offsets of random_question()
 '''
 
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
     difficulty = Column(Integer)
 
     def __init__(self, question, answer, category, difficulty):
@@ -83,6 +88,7 @@ class Category(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        category_cache.invalidate()
 
     def format(self):
         return {
@@ -93,3 +99,48 @@ class Category(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        category_cache.invalidate()
+
+
+'''
+CategoryCache
+    the {id: type} map and the serialized /categories body, loaded once
+    and reused until Category.insert() or delete() bumps the version.
+    Other processes don't see those calls, so with a ttl the cache also
+    rereads the (id, type) rows every ttl seconds and reloads when they
+    differ, which catches inserts, deletes and renames alike.
+'''
+
+
+class CategoryCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.loaded_version = None
+        self.checked_at = 0
+        self.snapshot = None
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+
+    def load(self, ttl=None):
+        """Returns (categories, serialized body, etag)."""
+        with self.lock:
+            now = time.monotonic()
+            if self.loaded_version == self.version and ttl is not None and now - self.checked_at >= ttl:
+                self.checked_at = now
+                current = {id: type for id, type in db.session.query(Category.id, Category.type)}
+                if current != self.snapshot[0]:
+                    self.version += 1
+
+            if self.loaded_version != self.version:
+                categories = {category.id: category.type for category in Category.query.order_by(Category.id)}
+                body = json.dumps({'success': True, 'categories': categories}, sort_keys=True)
+                self.snapshot = (categories, body, hashlib.sha1(body.encode()).hexdigest())
+                self.loaded_version = self.version
+                self.checked_at = now
+            return self.snapshot
+
+
+category_cache = CategoryCache()
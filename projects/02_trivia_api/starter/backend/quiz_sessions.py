@@ -0,0 +1,119 @@
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+'''
+SeenSet
+    the ids of the questions a quiz has asked, kept roaring bitmap style:
+    ids are split on their high 16 bits and each chunk is a sorted list
+    while it is sparse, then a 65536 bit int once it passes
+    ARRAY_LIMIT entries (8 KB, smaller than the list at that point).
+'''
+
+
+class SeenSet:
+    ARRAY_LIMIT = 4096
+
+    def __init__(self, ids=()):
+        self.chunks = {}
+        self.size = 0
+        for id in ids:
+            self.add(id)
+
+    def add(self, id):
+        high, low = id >> 16, id & 0xFFFF
+        chunk = self.chunks.setdefault(high, [])
+        if isinstance(chunk, int):
+            if not chunk >> low & 1:
+                self.chunks[high] = chunk | 1 << low
+                self.size += 1
+            return
+
+        position = bisect_left(chunk, low)
+        if position < len(chunk) and chunk[position] == low:
+            return
+        chunk.insert(position, low)
+        self.size += 1
+        if len(chunk) > self.ARRAY_LIMIT:
+            bitmap = 0
+            for value in chunk:
+                bitmap |= 1 << value
+            self.chunks[high] = bitmap
+
+    def __contains__(self, id):
+        chunk = self.chunks.get(id >> 16)
+        if chunk is None:
+            return False
+        low = id & 0xFFFF
+        if isinstance(chunk, int):
+            return bool(chunk >> low & 1)
+        position = bisect_left(chunk, low)
+        return position < len(chunk) and chunk[position] == low
+
+    def __iter__(self):
+        for high in sorted(self.chunks):
+            chunk = self.chunks[high]
+            if isinstance(chunk, int):
+                while chunk:
+                    lowest = chunk & -chunk
+                    yield high << 16 | lowest.bit_length() - 1
+                    chunk ^= lowest
+            else:
+                for low in chunk:
+                    yield high << 16 | low
+
+    def __len__(self):
+        return self.size
+
+
+'''
+QuizSessionStore
+    quizzes in progress, keyed by an unguessable token. Sessions expire
+    ttl seconds after their last round; the least recently used ones
+    are swept whenever a session is started or looked up. The store is
+    per process, so with several workers a quiz must stay on one.
+'''
+
+
+class QuizSession:
+    def __init__(self, category_id):
+        self.category_id = category_id
+        self.seen = SeenSet()
+        self.touched_at = time.monotonic()
+
+
+class QuizSessionStore:
+    def __init__(self, ttl, max_sessions=100000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def start(self, category_id):
+        token = secrets.token_urlsafe(16)
+        with self.lock:
+            self.evict()
+            self.sessions[token] = QuizSession(category_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return token
+
+    def get(self, token):
+        with self.lock:
+            self.evict()
+            session = self.sessions.get(token)
+            if session is not None:
+                session.touched_at = time.monotonic()
+                self.sessions.move_to_end(token)
+            return session
+
+    def evict(self):
+        expired = time.monotonic() - self.ttl
+        while self.sessions:
+            token, session = next(iter(self.sessions.items()))
+            if session.touched_at > expired:
+                break
+            del self.sessions[token]
@@ -1,9 +1,11 @@
 import unittest
 import json
+from collections import Counter
 from flask_sqlalchemy import SQLAlchemy
 
-from flaskr.app import create_app
-from models import setup_db, Category, Question
+from flaskr.app import create_app, random_question
+from models import setup_db, db, Category, Question
+from quiz_sessions import SeenSet
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -50,6 +52,44 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['categories'])
         category.delete()
 
+    def test_categories_cached_until_changed(self):
+        category = Category(type='Science')
+        category.insert()
+
+        res = self.client().get('/categories')
+        self.assertEqual(json.loads(res.data)['categories'][str(category.id)], 'Science')
+        res = self.client().get('/categories', headers={'If-None-Match': res.headers['ETag'].strip('"')})
+        self.assertEqual(res.status_code, 304)
+
+        category_id = category.id
+        category.delete()
+        res = self.client().get('/categories')
+        self.assertNotIn(str(category_id), json.loads(res.data)['categories'])
+
+    def test_categories_reloaded_after_change_in_other_process(self):
+        app = create_app({'CATEGORY_CACHE_TTL': 0})
+        self.client().get('/categories')
+
+        # another worker's insert never calls this process's Category.insert()
+        with app.app_context():
+            db.session.execute(Category.__table__.insert().values(type='Art'))
+            db.session.commit()
+            category_id = db.session.query(db.func.max(Category.id)).scalar()
+
+        res = app.test_client().get('/categories')
+        self.assertEqual(json.loads(res.data)['categories'][str(category_id)], 'Art')
+
+        # a rename keeps the row count and ids unchanged
+        with app.app_context():
+            db.session.execute(Category.__table__.update().where(Category.id == category_id).values(type='Arts'))
+            db.session.commit()
+
+        res = app.test_client().get('/categories')
+        self.assertEqual(json.loads(res.data)['categories'][str(category_id)], 'Arts')
+
+        with app.app_context():
+            Category.query.get(category_id).delete()
+
     def test_get_questions(self):
         question = Question(**self.new_question)
         question.insert()
@@ -63,6 +103,29 @@ class TriviaTestCase(unittest.TestCase):
 
         question.delete()
 
+    def test_get_questions_follows_cursor(self):
+        questions = [Question(**self.new_question) for _ in range(12)]
+        for question in questions:
+            question.insert()
+        ids = [question.id for question in questions]
+
+        res = self.client().get('/questions?cursor=' + str(ids[0] - 1))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([q['id'] for q in data['questions']], ids[:10])
+        self.assertEqual(data['next_cursor'], ids[9])
+        self.assertTrue(data['total_questions'] >= 12)
+
+        res = self.client().get('/questions?cursor=' + str(data['next_cursor']))
+        data = json.loads(res.data)
+
+        self.assertEqual([q['id'] for q in data['questions']], ids[10:])
+        self.assertEqual(data['next_cursor'], None)
+
+        for question in questions:
+            question.delete()
+
     def test_404_sent_requesting_beyond_valid_page(self):
         res = self.client().get('questions?page=1000')
         data = json.loads(res.data)
@@ -127,6 +190,15 @@ class TriviaTestCase(unittest.TestCase):
 
         question.delete()
 
+    def test_post_question_stores_integer_category(self):
+        res = self.client().post('/question', json=dict(self.new_question, category='1'))
+        question = Question.query.get(json.loads(res.data)['created'])
+
+        self.assertEqual(question.category, 1)
+        self.assertEqual(question.format()['category'], 1)
+
+        question.delete()
+
     def test_get_category_questions(self):
         question = Question(**self.new_question)
         question.insert()
@@ -168,6 +240,102 @@ class TriviaTestCase(unittest.TestCase):
 
         question.delete()
 
+    def test_random_question_is_uniform_within_a_category(self):
+        quiz = Category(type='Quiz')
+        other = Category(type='Other')
+        quiz.insert()
+        other.insert()
+        quiz_id, other_id = quiz.id, other.id
+        # the category's ids are spread out by other categories' questions, with a wide gap before the last
+        categories = [quiz_id] * 3 + [other_id] * 50 + [quiz_id]
+        questions = [Question(question='q', answer='a', category=category, difficulty=1) for category in categories]
+        for question in questions:
+            question.insert()
+        ids = [question.id for question, category in zip(questions, categories) if category == quiz_id]
+
+        with self.app.app_context():
+            draws = Counter(random_question(quiz_id, set()).id for _ in range(2000))
+
+        self.assertEqual(sorted(draws), ids)
+        for id in ids:
+            self.assertTrue(400 < draws[id] < 600, draws)
+
+        for question in questions:
+            question.delete()
+        Category.query.get(quiz_id).delete()
+        Category.query.get(other_id).delete()
+
+    def test_play_quiz_asks_every_question_once(self):
+        category = Category(type='Quiz')
+        category.insert()
+        category_id = category.id
+        questions = [Question(question='q', answer='a', category=category_id, difficulty=1) for _ in range(4)]
+        for question in questions:
+            question.insert()
+        ids = [question.id for question in questions]
+
+        previous_questions = []
+        for _ in range(4):
+            res = self.client().post('/quizzes', json={'quiz_category': {'id': category_id, 'type': 'Quiz'},
+                                                       'previous_questions': previous_questions})
+            previous_questions.append(json.loads(res.data)['question']['id'])
+
+        res = self.client().post('/quizzes', json={'quiz_category': {'id': category_id, 'type': 'Quiz'},
+                                                   'previous_questions': previous_questions})
+        self.assertEqual(sorted(previous_questions), ids)
+        self.assertEqual(json.loads(res.data)['question'], None)
+
+        for question in questions:
+            question.delete()
+        Category.query.get(category_id).delete()
+
+    def test_quiz_session_remembers_asked_questions(self):
+        category = Category(type='Quiz')
+        category.insert()
+        category_id = category.id
+        questions = [Question(question='q', answer='a', category=category_id, difficulty=1) for _ in range(3)]
+        for question in questions:
+            question.insert()
+        ids = [question.id for question in questions]
+
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': category_id, 'type': 'Quiz'}})
+        token = json.loads(res.data)['token']
+
+        asked = []
+        for _ in range(3):
+            data = json.loads(self.client().post('/quizzes/sessions/' + token + '/next').data)
+            asked.append(data['question']['id'])
+        data = json.loads(self.client().post('/quizzes/sessions/' + token + '/next').data)
+
+        self.assertEqual(sorted(asked), ids)
+        self.assertEqual(data['question'], None)
+        self.assertEqual(data['asked'], 3)
+
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': str(category_id), 'type': 'Quiz'}})
+        token = json.loads(res.data)['token']
+        data = json.loads(self.client().post('/quizzes/sessions/' + token + '/next').data)
+        self.assertIn(data['question']['id'], ids)
+
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': 'science'}})
+        self.assertEqual(res.status_code, 400)
+
+        for question in questions:
+            question.delete()
+        Category.query.get(category_id).delete()
+
+    def test_seen_set_switches_to_bitmap(self):
+        ids = list(range(70000, 70000 + 3 * (SeenSet.ARRAY_LIMIT + 1), 3)) + [5]
+        seen = SeenSet(ids)
+
+        self.assertTrue(isinstance(seen.chunks[1], int))
+        self.assertEqual(len(seen), len(ids))
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertIn(5, seen)
+        self.assertNotIn(70001, seen)
+
     def test_play_quiz_when_all_questions_are_answered(self):
         question = Question(**self.new_question)
         question.insert()